@@ -0,0 +1,188 @@
+"""离线基准测试用的本地替身服务：嵌入接口、对话补全接口（含流式）和搜索后端。
+
+只实现被测代码用到的最小协议，返回结果是确定的，便于不同提交之间对比。
+"""
+import hashlib
+import json
+import threading
+import time
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional, Sequence
+
+EMBEDDING_DIM = 1024
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """由文本哈希决定的单位向量，同一文本总是得到同一向量。"""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(dim).astype('float32')
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def make_outline(topic: str, sections: int = 6, subsections: int = 4, points: int = 3) -> str:
+    """生成知识总结页期望的 markdown 层级结构（## / ### / -）。"""
+    lines = [f"# {topic}"]
+    for i in range(1, sections + 1):
+        lines.append(f"## {topic} 要点 {i}")
+        for j in range(1, subsections + 1):
+            lines.append(f"### 要点 {i}.{j}")
+            for k in range(1, points + 1):
+                lines.append(f"- 细节 {i}.{j}.{k}：关于{topic}的说明")
+    return "\n".join(lines)
+
+
+def default_chat_response(messages: List[dict]) -> str:
+    return make_outline(messages[-1]["content"][:20] if messages else "主题")
+
+
+class FakeServices:
+    """在本机随机端口上启动的 HTTP 替身服务。
+
+    - POST .../embeddings：返回 dim 维确定性向量，每个请求等待 embedding_latency 秒；
+    - POST .../chat/completions：等待 chat_latency 秒后返回 response_fn(messages)；
+      stream=true 时按 chunk_chars 个字符一块、间隔 chunk_interval 秒以 SSE 推送；
+      fail_statuses 中的状态码依次作为前几个对话请求的错误响应，用于测试重试。
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, embedding_latency: float = 0.0, chat_latency: float = 0.0,
+                 chunk_chars: int = 16, chunk_interval: float = 0.0,
+                 response_fn: Callable[[List[dict]], str] = default_chat_response,
+                 fail_statuses: Sequence[int] = ()):
+        self.dim = dim
+        self.embedding_latency = embedding_latency
+        self.chat_latency = chat_latency
+        self.chunk_chars = chunk_chars
+        self.chunk_interval = chunk_interval
+        self.response_fn = response_fn
+        self.fail_statuses = list(fail_statuses)
+        self.requests = {"embeddings": 0, "chat": 0}
+        self._requests_lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/paas/v4"
+
+    @property
+    def embedding_url(self) -> str:
+        return f"{self.base_url}/embeddings"
+
+    def start(self) -> "FakeServices":
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload: dict, status: int = 200):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.endswith("/embeddings"):
+                    services._handle_embeddings(self, payload)
+                elif self.path.endswith("/chat/completions"):
+                    services._handle_chat(self, payload)
+                else:
+                    self.send_error(404)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _count(self, kind: str) -> Optional[int]:
+        """计数并返回本次请求应返回的错误状态码（没有则为 None）。"""
+        with self._requests_lock:
+            self.requests[kind] += 1
+            if kind == "chat" and self.fail_statuses:
+                return self.fail_statuses.pop(0)
+        return None
+
+    def _handle_embeddings(self, handler, payload: dict):
+        self._count("embeddings")
+        time.sleep(self.embedding_latency)
+        texts = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+        handler._send_json({
+            "model": payload.get("model"),
+            "object": "list",
+            "data": [{"index": i, "object": "embedding", "embedding": fake_embedding(text, self.dim)}
+                     for i, text in enumerate(texts)],
+            "usage": {"prompt_tokens": sum(len(text) for text in texts), "total_tokens": sum(len(text) for text in texts)}
+        })
+
+    def _handle_chat(self, handler, payload: dict):
+        status = self._count("chat")
+        if status is not None:
+            handler._send_json({"error": {"code": str(status), "message": "fake failure"}}, status)
+            return
+        time.sleep(self.chat_latency)
+        content = self.response_fn(payload.get("messages", []))
+        created = int(time.time())
+        if not payload.get("stream"):
+            handler._send_json({
+                "id": "fake", "created": created, "model": payload.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(content), "total_tokens": len(content)}
+            })
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        for start in range(0, len(content), self.chunk_chars):
+            chunk = {
+                "id": "fake", "created": created, "model": payload.get("model"),
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": content[start:start + self.chunk_chars]}}]
+            }
+            handler.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+            handler.wfile.flush()
+            if self.chunk_interval:
+                time.sleep(self.chunk_interval)
+        final = {"id": "fake", "created": created, "model": payload.get("model"),
+                 "choices": [{"index": 0, "finish_reason": "stop", "delta": {"role": "assistant", "content": ""}}]}
+        handler.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+        handler.wfile.flush()
+        handler.close_connection = True
+
+
+class FakeSearchBackend:
+    """具有 DDGS.text 接口的搜索后端，每次查询等待 latency 秒，返回确定的结果。"""
+
+    def __init__(self, latency: float = 0.0, results: int = 5):
+        self.latency = latency
+        self.results = results
+
+    def text(self, query: str, max_results: int = 5) -> List[dict]:
+        time.sleep(self.latency)
+        return [
+            {"title": f"{query} 相关文章 {i}", "href": f"https://example.com/{hashlib.md5(query.encode('utf-8')).hexdigest()[:8]}/{i}",
+             "body": f"这是关于{query}的第 {i} 条搜索摘要。"}
+            for i in range(min(self.results, max_results))
+        ]
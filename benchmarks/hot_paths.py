@@ -0,0 +1,311 @@
+"""离线测量主要热点路径的吞吐、延迟和内存占用。
+
+嵌入、对话和搜索都由 benchmarks/fake_services.py 中的本地替身提供，不访问外网；
+所有文件写在临时目录中。用 --json 保存结果，再用 --compare 与其他提交的结果对比。
+
+用法: python -m benchmarks.hot_paths --sizes small medium --json bench.json
+      python -m benchmarks.hot_paths --compare bench.json
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from typing import Callable, List, Optional
+from benchmarks.ann_benchmark import make_synthetic_vectors
+from benchmarks.fake_services import FakeServices, FakeSearchBackend, make_outline, EMBEDDING_DIM
+from utils.resources import set_resource
+
+SIZES = {
+    "small": {"text_chars": 5000, "store_rows": 2000, "pdf_pages": 20, "outline": (4, 3, 2), "queries": 50},
+    "medium": {"text_chars": 50000, "store_rows": 20000, "pdf_pages": 100, "outline": (8, 5, 4), "queries": 100},
+    "large": {"text_chars": 200000, "store_rows": 100000, "pdf_pages": 400, "outline": (16, 8, 6), "queries": 200},
+}
+BENCHMARKS = ("embed_long_text", "kb_index", "pdf", "graph", "summary_flow")
+SAMPLE_SENTENCE = "小红书博主需要持续输出有价值的内容，标题要抓人眼球，正文要真诚分享经验。"
+
+
+class NullPlaceholder:
+    """代替 st.empty()，让 render_stream 按页面中的节奏调用 on_update。"""
+
+    def markdown(self, text):
+        pass
+
+
+def synthetic_text(chars: int) -> str:
+    paragraphs, length, i = [], 0, 0
+    while length < chars:
+        paragraph = f"第{i}段。" + SAMPLE_SENTENCE * 4
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+        i += 1
+    return "\n\n".join(paragraphs)[:chars]
+
+
+def measure(fn: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None):
+    """计时 repeat 次（不开 tracemalloc），再额外运行一次记录 Python 堆峰值。"""
+    latencies = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return latencies, peak
+
+
+def make_row(benchmark: str, size: str, units: float, unit: str, latencies: List[float], peak_bytes: int) -> dict:
+    p50 = float(np.percentile(latencies, 50))
+    return {
+        "benchmark": benchmark,
+        "size": size,
+        "units": units,
+        "unit": unit,
+        "throughput": units / p50 if p50 else float("inf"),
+        "p50_ms": p50 * 1000,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000,
+        "peak_mb": peak_bytes / 2 ** 20
+    }
+
+
+def use_fresh_embedding_cache(services: FakeServices, name: str):
+    from knowledge_base.embedding_cache import EmbeddingCache
+    from knowledge_base.embedding_client import EmbeddingClient
+    from knowledge_base.embeddings import EMBEDDING_MODEL
+    path = f"{name}-{time.perf_counter_ns()}.sqlite3"
+    cache = EmbeddingCache(path, 1000000)
+    set_resource("embedding_cache", cache)
+    set_resource("embedding_client", EmbeddingClient(services.embedding_url, "bench", EMBEDDING_MODEL, cache=cache))
+
+
+def bench_embed_long_text(size: str, params: dict, services: FakeServices, repeat: int) -> List[dict]:
+    from knowledge_base.embeddings import get_embeddings_for_long_text
+    text = synthetic_text(params["text_chars"])
+    rows = []
+    # 冷：每次换一个空的嵌入缓存，全部分段都要请求接口
+    latencies, peak = measure(lambda: get_embeddings_for_long_text(text), repeat,
+                              setup=lambda: use_fresh_embedding_cache(services, "embed-cold"))
+    rows.append(make_row("embed_long_text/cold", size, len(text), "chars", latencies, peak))
+    # 热：同一段文本第二次嵌入，全部命中缓存
+    use_fresh_embedding_cache(services, "embed-warm")
+    get_embeddings_for_long_text(text)
+    latencies, peak = measure(lambda: get_embeddings_for_long_text(text), repeat)
+    rows.append(make_row("embed_long_text/warm", size, len(text), "chars", latencies, peak))
+    return rows
+
+
+def write_synthetic_store(store_dir: str, num_rows: int, with_sources: bool = False):
+    from knowledge_base.embedding_store import write_embedding_store, source_path
+    vectors = make_synthetic_vectors(num_rows, EMBEDDING_DIM)
+    records = [{"name": f"doc-{i // 100}.txt", "page": None} for i in range(num_rows)]
+    if with_sources:
+        # 每个文档一个源文件，每行指向其中的一句
+        encoded = SAMPLE_SENTENCE.encode('utf-8')
+        for i, record in enumerate(records):
+            doc_id = f"doc{i // 100}"
+            record.update({"doc_id": doc_id, "offset": (i % 100) * len(encoded), "length": len(encoded)})
+        os.makedirs(os.path.dirname(source_path(store_dir, "x")), exist_ok=True)
+        for doc in range((num_rows + 99) // 100):
+            with open(source_path(store_dir, f"doc{doc}"), 'wb') as f:
+                f.write(encoded * 100)
+    write_embedding_store(store_dir, records, vectors, EMBEDDING_DIM)
+    return vectors
+
+
+def bench_kb_index(size: str, params: dict, services: FakeServices, repeat: int) -> List[dict]:
+    from knowledge_base.knowledge_base_management import load_knowledge_base, build_faiss_index, search_similar_texts
+    store_dir = f"store-{size}"
+    write_synthetic_store(store_dir, params["store_rows"])
+    rows = []
+    latencies, peak = measure(lambda: load_knowledge_base(store_dir), repeat)
+    rows.append(make_row("kb_index/load", size, params["store_rows"], "rows", latencies, peak))
+
+    _, vectors = load_knowledge_base(store_dir)
+    latencies, peak = measure(lambda: build_faiss_index(vectors), repeat)
+    rows.append(make_row("kb_index/build", size, params["store_rows"], "rows", latencies, peak))
+
+    records, vectors = load_knowledge_base(store_dir)
+    index = build_faiss_index(vectors)
+    queries = make_synthetic_vectors(params["queries"], EMBEDDING_DIM, seed=1)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search_similar_texts(query.tolist(), records, index, 5, store_dir)
+        latencies.append(time.perf_counter() - start)
+    rows.append(make_row("kb_index/search", size, 1, "queries", latencies, 0))
+    return rows
+
+
+def make_pdf(pages: int) -> bytes:
+    import fitz  # PyMuPDF
+    doc = fitz.open()
+    body = (SAMPLE_SENTENCE * 3 + "\n") * 20
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((50, 72), f"Page {i + 1}\n" + body, fontname="china-s", fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def bench_pdf(size: str, params: dict, services: FakeServices, repeat: int) -> List[dict]:
+    from knowledge_base.document_reader import iter_pdf_pages
+    data = make_pdf(params["pdf_pages"])
+    latencies, peak = measure(lambda: sum(1 for _ in iter_pdf_pages(io.BytesIO(data))), repeat)
+    return [make_row("pdf/read_pages", size, params["pdf_pages"], "pages", latencies, peak)]
+
+
+def bench_graph(size: str, params: dict, services: FakeServices, repeat: int) -> List[dict]:
+    from methods.knowledge_summary import create_knowledge_graph, plot_knowledge_graph
+    from utils.vis_network import graph_payload
+    outline = make_outline("基准主题", *params["outline"])
+    graph = create_knowledge_graph(outline, "基准主题")
+    nodes = graph.number_of_nodes()
+    rows = []
+    latencies, peak = measure(lambda: create_knowledge_graph(outline, "基准主题"), repeat)
+    rows.append(make_row("graph/create", size, nodes, "nodes", latencies, peak))
+    latencies, peak = measure(lambda: json.dumps(graph_payload(graph), ensure_ascii=False), repeat)
+    rows.append(make_row("graph/vis_payload", size, nodes, "nodes", latencies, peak))
+    try:
+        import plotly  # noqa: F401
+    except ImportError:
+        return rows
+    latencies, peak = measure(lambda: plot_knowledge_graph(graph).to_json(), repeat)
+    rows.append(make_row("graph/plotly", size, nodes, "nodes", latencies, peak))
+    return rows
+
+
+def run_summary_flow(notes_input: str) -> dict:
+    """与 knowledge_summary_method 相同的调用顺序，去掉界面部分，返回各阶段耗时。"""
+    from methods.knowledge_summary import KnowledgeGraphBuilder, fetch_knowledge_from_api
+    from knowledge_base.knowledge_base_management import search_local_knowledge_base, get_embeddings_for_long_text, format_search_hit
+    from internet_search.duckduckgo_search import internet_search
+    from utils.retrieval import retrieve_concurrently
+    from config.config import RETRIEVAL_DEADLINES
+
+    start = time.perf_counter()
+    retrieval = retrieve_concurrently({
+        "knowledge_base": (lambda: search_local_knowledge_base(get_embeddings_for_long_text(notes_input)),
+                           RETRIEVAL_DEADLINES["knowledge_base"]),
+        "internet": (lambda: internet_search(notes_input), RETRIEVAL_DEADLINES["internet"]),
+    })
+    retrieved = time.perf_counter()
+    knowledge_base_result = '\n\n'.join(f"{format_search_hit(hit)}\n{hit['text']}"
+                                        for hit in retrieval["knowledge_base"].value or [])
+    builder = KnowledgeGraphBuilder(notes_input)
+    first_node = []
+
+    def update_graph(partial_response):
+        if builder.update(partial_response) and not first_node:
+            first_node.append(time.perf_counter())
+
+    response = fetch_knowledge_from_api(notes_input, knowledge_base_result, retrieval["internet"].value or "",
+                                        NullPlaceholder(), update_graph)
+    builder.update(response)
+    builder.close()
+    end = time.perf_counter()
+    return {"retrieval": retrieved - start, "first_node": (first_node[0] if first_node else end) - start,
+            "total": end - start, "nodes": builder.graph.number_of_nodes()}
+
+
+def bench_summary_flow(size: str, params: dict, services: FakeServices, repeat: int) -> List[dict]:
+    from knowledge_base.knowledge_base_management import EMBEDDING_STORE_DIR, refresh_knowledge_base_index
+    write_synthetic_store(EMBEDDING_STORE_DIR, params["store_rows"], with_sources=True)
+    refresh_knowledge_base_index()
+    outline_size = params["outline"]
+    services.response_fn = lambda messages: make_outline("基准主题", *outline_size)
+    use_fresh_embedding_cache(services, "flow")
+    run_summary_flow("预热")
+
+    # 每次用不同的输入，避免命中嵌入缓存和搜索缓存
+    counter = iter(range(10 ** 6))
+    stages = []
+    latencies, peak = measure(lambda: stages.append(run_summary_flow(f"如何运营小红书账号 {next(counter)}")), repeat)
+    nodes = stages[-1]["nodes"]
+    rows = [make_row("summary_flow/total", size, nodes, "nodes", latencies, peak)]
+    for stage in ("retrieval", "first_node"):
+        rows.append(make_row(f"summary_flow/{stage}", size, 1, "runs", [s[stage] for s in stages], 0))
+    return rows
+
+
+def configure_services(services: FakeServices, search_latency: float):
+    from utils.llm_gateway import LLMGateway
+    from internet_search.search_service import SearchService
+    # 不带回复缓存，也不限流，测的是代码本身的开销
+    set_resource("llm_gateway", LLMGateway("bench.secret", base_url=services.base_url, rate=1e6, burst=10 ** 6,
+                                           max_concurrency=64))
+    set_resource("search_service", SearchService(lambda: FakeSearchBackend(latency=search_latency)))
+
+
+def print_table(rows: List[dict], baseline: Optional[dict] = None):
+    header = f"{'benchmark':<24}{'size':<8}{'throughput':>19}{'p50 ms':>11}{'p95 ms':>11}{'peak MB':>10}"
+    print(header + ("  vs baseline p50" if baseline else ""))
+    for row in rows:
+        line = (f"{row['benchmark']:<24}{row['size']:<8}{row['throughput']:>10.1f} {row['unit'] + '/s':<10}"
+                f"{row['p50_ms']:>9.2f}{row['p95_ms']:>11.2f}{row['peak_mb']:>10.1f}")
+        if baseline:
+            old = baseline.get((row["benchmark"], row["size"]))
+            if old and old["p50_ms"]:
+                line += f"  {(row['p50_ms'] / old['p50_ms'] - 1) * 100:+7.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=list(SIZES))
+    parser.add_argument("--only", nargs="+", default=list(BENCHMARKS), choices=BENCHMARKS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="替身嵌入接口每个请求的延迟（秒）")
+    parser.add_argument("--chat-latency", type=float, default=0.2, help="替身对话接口首包前的延迟（秒）")
+    parser.add_argument("--chunk-interval", type=float, default=0.005, help="流式输出每块之间的间隔（秒）")
+    parser.add_argument("--search-latency", type=float, default=0.1, help="替身搜索后端每次查询的延迟（秒）")
+    parser.add_argument("--json", help="把结果写入该文件")
+    parser.add_argument("--compare", help="与之前 --json 保存的结果对比 p50")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = {(row["benchmark"], row["size"]): row for row in json.load(f)["results"]}
+
+    benchmarks = {
+        "embed_long_text": bench_embed_long_text,
+        "kb_index": bench_kb_index,
+        "pdf": bench_pdf,
+        "graph": bench_graph,
+        "summary_flow": bench_summary_flow,
+    }
+    cwd = os.getcwd()
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="lrb-bench-") as workdir, \
+            FakeServices(embedding_latency=args.embedding_latency, chat_latency=args.chat_latency,
+                         chunk_interval=args.chunk_interval) as services:
+        # 知识库、缓存等相对路径都落在临时目录里
+        os.chdir(workdir)
+        try:
+            configure_services(services, args.search_latency)
+            for size in args.sizes:
+                for name in args.only:
+                    rows.extend(benchmarks[name](size, SIZES[size], services, args.repeat))
+        finally:
+            os.chdir(cwd)
+
+    print_table(rows, baseline)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"created": time.time(), "args": vars(args), "results": rows}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
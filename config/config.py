@@ -1,2 +1,54 @@
 openai_api_key = 'your api_key'
-MAX_HISTORY_LENGTH = 5
+HISTORY_TOKEN_BUDGET = 2000  # 每个会话聊天记录的 token 上限，超出时从最早的消息开始淘汰
+MAX_HISTORY_LENGTH = 500  # 条数安全上限，只防止大量极短消息堆积；正常情况下由 token 预算决定保留多少
+SESSION_IDLE_TTL = 3600  # 会话闲置超过该时间（秒）后清理其聊天记录
+
+# 大模型调用网关（utils/llm_gateway.py）
+LLM_BASE_URL = None  # 为 None 时使用智谱官方地址，可指向本地替身服务做测试
+LLM_TIMEOUT = 60  # 单次请求超时（秒）
+LLM_MAX_RETRIES = 3
+LLM_RATE_LIMIT = 2.0  # 每秒允许发出的请求数
+LLM_BURST = 5  # 令牌桶容量，允许的瞬时突发请求数
+LLM_MAX_CONCURRENCY = 8
+
+# 大模型回复缓存（utils/response_cache.py）
+LLM_CACHE_FILE = "llm_cache.sqlite3"
+LLM_CACHE_TTL = 7 * 24 * 3600  # 缓存有效期（秒）
+LLM_CACHE_MAX_ENTRIES = 5000
+LLM_CACHE_SIMILARITY = 0.95  # 语义匹配的最低余弦相似度
+# 按方法开启缓存："exact" 只做精确匹配，"semantic" 额外做语义匹配，未列出的方法不缓存
+LLM_CACHE_POLICIES = {
+    "generate_persona": "exact",
+    "fetch_knowledge_from_api": "semantic",
+    "assess_content": "exact",
+}
+
+# 知识图谱渲染方式："vis-network" 在浏览器端绘制并支持折叠子树，"plotly" 为服务端生成的静态散点图
+KNOWLEDGE_GRAPH_RENDERER = "vis-network"
+
+# 知识总结检索：各来源的截止时间（秒），超时的来源会被跳过
+RETRIEVAL_DEADLINES = {
+    "knowledge_base": 10,
+    "internet": 8,
+}
+
+# 知识库切块与向量索引（knowledge_base/knowledge_base_management.py）
+CHUNK_SIZE = 512  # 每块最多字符数
+CHUNK_OVERLAP = 64  # 相邻块重叠的字符数
+INDEX_TYPE = "flat"  # 可选 "flat"、"ivf_flat"、"ivf_pq"、"hnsw"，见 knowledge_base/ann_index.py
+INDEX_PARAMS = {}  # 覆盖 DEFAULT_INDEX_PARAMS 中对应类型的参数，如 {"nprobe": 32}
+
+# 练习题库（methods/question_bank.py）
+QUESTION_BANK_FILE = "question_bank.sqlite3"
+QUESTION_TOPIC_SIMILARITY = 0.85  # 主题向量达到该相似度才视为同一主题的题目
+QUESTION_DUPLICATE_SIMILARITY = 0.92  # 新题与已有题目相似度达到该值时视为重复
+
+# 人设头像本地缓存（utils/image_cache.py）
+AVATAR_CACHE_DIR = "avatar_cache"
+AVATAR_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 原图与缩略图总大小上限，超出时按最近使用时间淘汰
+AVATAR_THUMBNAIL_SIZE = 256  # 缩略图最长边（像素）
+
+# 会话持久化（utils/session_store.py）
+SESSION_DB_FILE = "sessions.sqlite3"
+SESSION_FLUSH_INTERVAL = 1.0  # 后台批量写入间隔（秒）
+SESSION_RETENTION = 30 * 24 * 3600  # 超过该时间（秒）未更新的会话会被删除
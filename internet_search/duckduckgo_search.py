@@ -1,9 +1,22 @@
-from duckduckgo_search import DDGS
+from internet_search.search_service import SearchService, reformulate_query
+from utils.resources import get_resource
 
-def internet_search(query):
-    """Perform an internet search using DuckDuckGo and return the results."""
-    ddgs = DDGS()
-    results = ddgs.text(query, max_results=5)
+def _new_backend():
+    # duckduckgo_search 只在第一次真正搜索时导入
+    from duckduckgo_search import DDGS
+    return DDGS()
+
+def get_search_service():
+    return get_resource("search_service", lambda: SearchService(_new_backend))
+
+def internet_search(query, fan_out=False):
+    """Perform an internet search using DuckDuckGo and return the results.
+
+    Results are cached per normalized query and bounded by the service deadline.
+    With fan_out, a few reformulated queries run in parallel and are merged by URL.
+    """
+    queries = reformulate_query(query) if fan_out else [query]
+    results = get_search_service().search_many(queries)
     search_results = []
     for result in results:
         search_results.append(f"标题: {result['title']}\n链接: {result['href']}\n描述: {result['body']}\n")
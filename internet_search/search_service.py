@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, List, Optional
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def reformulate_query(query: str) -> List[str]:
+    """生成几个改写后的查询，扩大召回；第一个总是原查询。"""
+    query = " ".join(query.split())
+    return [query, f"{query} 小红书", f"{query} 教程 技巧"]
+
+
+class SearchService:
+    """带缓存和截止时间的联网搜索。
+
+    backend_factory 返回一个具有 text(query, max_results=...) 方法的对象（如 DDGS），
+    每个工作线程创建一次后复用；结果按规范化后的查询缓存 ttl 秒。
+    超过截止时间的查询不会被中断，完成后结果照样写入缓存；同一查询正在进行时不会重复提交。
+    """
+
+    def __init__(self, backend_factory: Callable, max_results: int = 5, deadline: float = 5,
+                 ttl: float = 3600, max_entries: int = 512, max_workers: int = 4):
+        self.backend_factory = backend_factory
+        self.max_results = max_results
+        self.deadline = deadline
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+
+    def _backend(self):
+        if not hasattr(self._local, "backend"):
+            self._local.backend = self.backend_factory()
+        return self._local.backend
+
+    def _cached(self, key: str) -> Optional[List[dict]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            created, results = entry
+            if time.monotonic() - created > self.ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return results
+
+    def _store(self, key: str, results: List[dict]):
+        with self._lock:
+            self._cache[key] = (time.monotonic(), results)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _fetch(self, query: str) -> List[dict]:
+        return list(self._backend().text(query, max_results=self.max_results) or [])
+
+    def _finish(self, key: str, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self._store(key, future.result())
+
+    def _submit(self, query: str):
+        key = normalize_query(query)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached, None
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._fetch, query)
+                self._inflight[key] = future
+                new = True
+            else:
+                new = False
+        if new:
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return None, future
+
+    def search(self, query: str, deadline: Optional[float] = None) -> List[dict]:
+        """超时或出错时返回空列表，且不写入缓存。"""
+        return self.search_many([query], deadline)
+
+    def search_many(self, queries: List[str], deadline: Optional[float] = None) -> List[dict]:
+        """并发执行多个查询，在同一截止时间内收集结果，按链接去重后合并。"""
+        pending = [self._submit(query) for query in queries]
+        futures = [future for _, future in pending if future is not None]
+        if futures:
+            wait(futures, timeout=self.deadline if deadline is None else deadline)
+
+        merged, seen = [], set()
+        for cached, future in pending:
+            results = cached
+            if future is not None:
+                if not future.done():
+                    continue
+                try:
+                    results = future.result(timeout=0)
+                except Exception:
+                    continue
+            for result in results:
+                if result.get('href') not in seen:
+                    seen.add(result.get('href'))
+                    merged.append(result)
+        return merged
@@ -0,0 +1,89 @@
+import faiss
+import numpy as np
+
+# 可选的索引类型及其默认参数：
+#   flat      精确检索，逐条比较所有向量
+#   ivf_flat  倒排聚类，只扫描最近的 nprobe 个簇
+#   ivf_pq    倒排聚类 + 乘积量化，每个向量压缩为 m 个 nbits 位编码
+#   hnsw      分层小世界图，无需训练
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+DEFAULT_INDEX_PARAMS = {
+    "flat": {},
+    "ivf_flat": {"nlist": 1024, "nprobe": 16},
+    "ivf_pq": {"nlist": 1024, "nprobe": 16, "m": 64, "nbits": 8},
+    "hnsw": {"m": 32, "ef_construction": 200, "ef_search": 64},
+}
+# faiss 建议每个聚类中心至少 39 个训练样本
+MIN_POINTS_PER_CENTROID = 39
+MAX_TRAINING_POINTS = 100000
+ADD_BLOCK_ROWS = 65536
+
+
+def _as_float32(vectors: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(vectors, dtype='float32')
+
+
+def _training_sample(vectors: np.ndarray, size: int) -> np.ndarray:
+    if len(vectors) <= size:
+        return _as_float32(vectors)
+    rows = np.sort(np.random.default_rng(0).choice(len(vectors), size, replace=False))
+    return _as_float32(vectors[rows])
+
+
+def _make_index(dim: int, count: int, index_type: str, params: dict):
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim), None
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+        index.hnsw.efSearch = params["ef_search"]
+        return index, None
+
+    # 数据量不足以训练时缩小 nlist，仍不够则退回精确检索
+    nlist = min(params["nlist"], count // MIN_POINTS_PER_CENTROID)
+    if index_type == "ivf_pq" and count < 2 ** params["nbits"]:
+        nlist = 0
+    if nlist < 1:
+        return faiss.IndexFlatL2(dim), None
+
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, params["m"], params["nbits"])
+    index.nprobe = min(params["nprobe"], nlist)
+    training_size = min(MAX_TRAINING_POINTS, max(nlist * MIN_POINTS_PER_CENTROID, 2 ** params.get("nbits", 0)))
+    return index, training_size
+
+
+def build_index(vectors: np.ndarray, dim: int, index_type: str = "flat", **params):
+    """按 index_type 构建 faiss 索引，必要时先在抽样数据上训练。"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"不支持的索引类型: {index_type}，可选: {', '.join(INDEX_TYPES)}")
+    params = {**DEFAULT_INDEX_PARAMS[index_type], **params}
+
+    index, training_size = _make_index(dim, len(vectors), index_type, params)
+    if training_size:
+        index.train(_training_sample(vectors, training_size))
+    # 分块添加，float16 mmap 不必一次性转换成完整的 float32 副本
+    for start in range(0, len(vectors), ADD_BLOCK_ROWS):
+        index.add(_as_float32(vectors[start:start + ADD_BLOCK_ROWS]))
+    return index
+
+
+def search_excluding(index, query: np.ndarray, k: int, excluded_ids: np.ndarray):
+    """检索时跳过 excluded_ids 中的向量，结果仍是 k 个最近邻。
+
+    带 SearchParameters 检索会覆盖索引上设置的 nprobe/efSearch，这里沿用索引自身的值。
+    """
+    if len(excluded_ids) == 0:
+        return index.search(query, k)
+    selector = faiss.IDSelectorNot(faiss.IDSelectorBatch(np.ascontiguousarray(excluded_ids, dtype='int64')))
+    if isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    elif isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return index.search(query, k, params=params)
@@ -0,0 +1,67 @@
+import re
+from typing import Iterator, List, Tuple
+
+# 句末标点、英文句号后的空白以及换行都视为可切分的位置
+_BOUNDARY = re.compile(r'\n\s*\n|\n|[。！？!?；;…]+[”’」』）)]*|\.(?=\s)')
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n$')
+
+
+def _sentence_spans(text: str, max_length: int) -> Iterator[Tuple[int, int]]:
+    start = 0
+    ends = [m.end() for m in _BOUNDARY.finditer(text)]
+    ends.append(len(text))
+    for end in ends:
+        if end <= start:
+            continue
+        # 超长句子只能硬切
+        while end - start > max_length:
+            yield start, start + max_length
+            start += max_length
+        yield start, end
+        start = end
+
+
+def split_text(text: str, chunk_size: int = 512, overlap: int = 64) -> List[Tuple[int, int]]:
+    """按句子/段落边界把文本切成不超过 chunk_size 的块，返回 (start, end) 字符偏移。
+
+    相邻块之间重叠不超过 overlap 个字符的完整句子；块内若有段落分隔且位于后半段，
+    优先在段落处截断。
+    """
+    spans = list(_sentence_spans(text, chunk_size))
+    chunks = []
+    i = 0
+    while i < len(spans):
+        start = spans[i][0]
+        j = i
+        while j + 1 < len(spans) and spans[j + 1][1] - start <= chunk_size:
+            j += 1
+
+        if j + 1 < len(spans):
+            for k in range(j, i, -1):
+                if spans[k][1] - start < chunk_size // 2:
+                    break
+                if _PARAGRAPH_BREAK.search(text, spans[k][0], spans[k][1]):
+                    j = k
+                    break
+
+        end = spans[j][1]
+        chunks.append(_strip_span(text, start, end))
+        if j + 1 >= len(spans):
+            break
+
+        next_i = j + 1
+        while next_i - 1 > i and end - spans[next_i - 1][0] <= overlap:
+            next_i -= 1
+        # 重叠部分不能挤掉下一个新句子，否则会产生被上一块完全包含的重复块
+        while next_i <= j and spans[j + 1][1] - spans[next_i][0] > chunk_size:
+            next_i += 1
+        i = next_i
+    return [(start, end) for start, end in chunks if end > start]
+
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
@@ -0,0 +1,134 @@
+import os
+import re
+import codecs
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+PDF_PAGES_PER_TASK = 16
+PDF_PARALLEL_MIN_PAGES = 64  # 页数较少时进程池的启动开销大于收益
+PDF_MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+READ_BLOCK_SIZE = 1 << 20
+ENCODING_SAMPLE_SIZE = 64 * 1024  # chardet 只看开头（或第一个非 ASCII 字节起）这么多字节
+TEXT_BLOCK_CHARS = 256 * 1024  # 文本文件按块送入切块器，块尽量在换行处结束
+
+# UTF-32 的 BOM 以 UTF-16 LE 的 BOM 开头，必须先判断
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    import fitz  # PyMuPDF
+    with fitz.open(path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+
+def _spill_to_temp_file(uploaded_file) -> str:
+    # 写入临时文件，子进程按路径各自打开，不必在进程间传递整份 PDF
+    uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        shutil.copyfileobj(uploaded_file, tmp, READ_BLOCK_SIZE)
+        return tmp.name
+
+
+def _iter_parallel(path: str, page_count: int) -> Iterator[Tuple[int, str]]:
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+    # Streamlit 服务是多线程的，fork 不安全，使用 spawn
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=PDF_MAX_WORKERS, mp_context=context) as executor:
+        # 最多预取 2 * workers 个页段，保证内存占用与总页数无关
+        pending = []
+        next_range = 0
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < 2 * PDF_MAX_WORKERS:
+                start, stop = ranges[next_range]
+                pending.append((start, executor.submit(_extract_page_range, path, start, stop)))
+                next_range += 1
+            start, future = pending.pop(0)
+            for offset, text in enumerate(future.result()):
+                yield start + offset + 1, text
+
+
+def iter_pdf_pages(uploaded_file) -> Iterator[Tuple[int, str]]:
+    """按页码顺序逐页产出 (页码, 文本)，页码从 1 开始。"""
+    # PyMuPDF 和 chardet 只在真正读取文件时导入，知识检索等页面不需要它们
+    import fitz  # PyMuPDF
+    path = _spill_to_temp_file(uploaded_file)
+    try:
+        with fitz.open(path) as doc:
+            page_count = doc.page_count
+            if page_count < PDF_PARALLEL_MIN_PAGES or PDF_MAX_WORKERS == 1:
+                for page_number, page in enumerate(doc, 1):
+                    yield page_number, page.get_text()
+                return
+        yield from _iter_parallel(path, page_count)
+    finally:
+        os.remove(path)
+
+
+_NON_ASCII = re.compile(rb'[\x80-\xff]')
+
+
+def detect_encoding(sample: bytes, complete: bool = False) -> str:
+    """根据开头的采样判断编码；complete 表示采样已是完整文件。
+
+    采样全是 ASCII 且不是完整文件时返回 'ascii'，表示尚无法判断，调用方应在出现非 ASCII 字节后重新判断。
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if sample.isascii():
+        return 'utf-8' if complete else 'ascii'
+    try:
+        # 增量解码器允许采样在多字节字符中间截断
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=complete)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    import chardet
+    encoding = chardet.detect(sample)['encoding'] or 'utf-8'
+    # chardet 常把中文报告为 GB2312，GB18030 是其超集，能解码更多字符
+    if encoding.lower() in ('gb2312', 'gbk'):
+        encoding = 'gb18030'
+    return encoding
+
+
+def _split_at_line(buffer: str) -> int:
+    cut = buffer.rfind('\n', TEXT_BLOCK_CHARS // 2, TEXT_BLOCK_CHARS)
+    return cut + 1 if cut >= 0 else TEXT_BLOCK_CHARS
+
+
+def iter_text_blocks(uploaded_file) -> Iterator[Tuple[Optional[int], str]]:
+    """逐块解码文本文件，产出 (None, 文本块)，与 iter_pdf_pages 的接口一致。"""
+    uploaded_file.seek(0)
+    first_block = uploaded_file.read(READ_BLOCK_SIZE)
+    encoding = detect_encoding(first_block[:ENCODING_SAMPLE_SIZE], complete=len(first_block) < ENCODING_SAMPLE_SIZE)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='ignore')
+
+    buffer = ""
+    block = first_block
+    while block:
+        if encoding == 'ascii' and not block.isascii():
+            # 前面全是 ASCII，各种编码下解码结果相同；从第一个非 ASCII 字节起重新判断
+            start = _NON_ASCII.search(block).start()
+            buffer += block[:start].decode('ascii')
+            block = block[start:]
+            encoding = detect_encoding(block[:ENCODING_SAMPLE_SIZE])
+            decoder = codecs.getincrementaldecoder(encoding)(errors='ignore')
+        buffer += decoder.decode(block)
+        while len(buffer) >= TEXT_BLOCK_CHARS:
+            cut = _split_at_line(buffer)
+            yield None, buffer[:cut]
+            buffer = buffer[cut:]
+        block = uploaded_file.read(READ_BLOCK_SIZE)
+    buffer += decoder.decode(b'', final=True)
+    if buffer:
+        yield None, buffer
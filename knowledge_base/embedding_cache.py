@@ -0,0 +1,81 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import Dict, List
+
+
+class EmbeddingCache:
+    """以 (模型名, 文本段哈希) 为键的磁盘嵌入缓存，按最近使用时间做 LRU 淘汰。"""
+
+    def __init__(self, path: str, max_entries: int = 200000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[str, List[float]]:
+        """返回命中的 {文本: 向量}，并刷新命中项的最近使用时间。"""
+        keys = {self.make_key(model, text): text for text in set(texts)}
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            # SQLite 单条语句的参数个数有限，分批查询
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, vector in rows:
+                    found[keys[key]] = np.frombuffer(vector, dtype='float32').tolist()
+                if rows:
+                    now = time.time_ns()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                    )
+            self._conn.commit()
+            self.hits += sum(1 for text in texts if text in found)
+            self.misses += sum(1 for text in texts if text not in found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        now = time.time_ns()
+        rows = [(self.make_key(model, text), np.asarray(vector, dtype='float32').tobytes(), now)
+                for text, vector in items.items()]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (self._count - self.max_entries,)
+                )
+                self._count = self.max_entries
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self._count
+        }
@@ -0,0 +1,74 @@
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from knowledge_base.embedding_cache import EmbeddingCache
+
+
+class EmbeddingClient:
+    """批量、并发地调用 /v4/embeddings。
+
+    每个请求携带 batch_size 段文本，最多 max_workers 个请求同时进行，
+    所有请求复用同一个 Session 的连接池；429/5xx 按指数退避自动重试。
+    传入 cache 时，已缓存的文本段不再请求接口。
+    """
+
+    def __init__(self, api_url: str, api_key: str, model: str, batch_size: int = 16,
+                 max_workers: int = 4, timeout: float = 30, max_retries: int = 5, backoff_factor: float = 0.5,
+                 cache: Optional[EmbeddingCache] = None):
+        self.api_url = api_url
+        self.model = model
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["POST"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        })
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        response = self.session.post(self.api_url, json={"model": self.model, "input": batch}, timeout=self.timeout)
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item.get("index", 0))
+        if len(data) != len(batch):
+            raise ValueError(f"嵌入接口返回 {len(data)} 条结果，请求了 {len(batch)} 条")
+        return [item["embedding"] for item in data]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if self.cache is None:
+            return self._embed_uncached(texts)
+
+        cached = self.cache.get_many(self.model, texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in cached))
+        if missing:
+            fetched = dict(zip(missing, self._embed_uncached(missing)))
+            self.cache.put_many(self.model, fetched)
+            cached.update(fetched)
+        return [cached[text] for text in texts]
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i+self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self._embed_batch(batches[0]) if batches else []
+
+        embeddings = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # map 按提交顺序返回结果，保证向量与文本一一对应
+            for batch_embeddings in executor.map(self._embed_batch, batches):
+                embeddings.extend(batch_embeddings)
+        return embeddings
@@ -0,0 +1,374 @@
+import os
+import json
+import threading
+import numpy as np
+from collections.abc import Sequence
+from typing import List, Tuple, Optional
+
+# 二进制向量库格式：
+#   meta.json              版本、维度、dtype、当前向量/行文件名、行数和文档表（每个文档一项：名称、doc_id、内容哈希、是否已删除）
+#   vectors-<generation>.bin  行主序的 float32/float16 原始矩阵，可直接 mmap
+#   rows-<generation>.bin     与向量逐行对应的结构化数组（所属文档下标、页码、字符区间、字节区间），可直接 mmap
+#   sources/<doc_id>.txt   文档抽取后的 UTF-8 全文，行中的 offset/length 指向其中的字节区间
+# meta.json 通过 os.replace 原子替换，是唯一的提交点；读者只会看到完整的某一代数据。
+# meta.json 的大小只与文档数有关，与块数无关。
+STORE_FORMAT = "lbr-embedding-store"
+STORE_VERSION = 2
+LEGACY_VERSIONS = (1,)  # 每行记录都写在 meta.json 中，加载时自动升级
+META_FILE = "meta.json"
+SOURCE_DIR = "sources"
+SUPPORTED_DTYPES = ("float32", "float16")
+# 数值字段为 -1 表示缺失（page 缺失时为 None）
+ROW_DTYPE = np.dtype([("doc", "<i4"), ("page", "<i4"), ("start", "<i8"), ("end", "<i8"),
+                      ("offset", "<i8"), ("length", "<i8")])
+ROW_FIELDS = ("start", "end", "offset", "length")
+DOCUMENT_FIELDS = ("doc_id", "content_hash")
+# 被替换文档的行先随文档标记为 deleted，超过该比例时整体重写为新一代文件
+COMPACT_DELETED_RATIO = 0.25
+COMPACT_BLOCK_ROWS = 4096
+
+_write_lock = threading.Lock()
+
+
+class StoreRecords(Sequence):
+    """向量库的逐行记录。数值字段来自 mmap 的行文件，名称和哈希每个文档只存一份；
+    按下标取出的是临时构造的 dict，字段与写入时的记录一致。"""
+
+    def __init__(self, rows: np.ndarray, documents: List[dict]):
+        self.rows = rows
+        self.documents = documents
+        doc_deleted = np.array([bool(document.get("deleted")) for document in documents], dtype=bool)
+        self.deleted = doc_deleted[rows["doc"]] if len(rows) else np.zeros(0, dtype=bool)
+        self.deleted_count = int(self.deleted.sum())
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        row = self.rows[i]
+        document = self.documents[row["doc"]]
+        record = {"name": document["name"]}
+        for field in DOCUMENT_FIELDS:
+            if field in document:
+                record[field] = document[field]
+        record["page"] = int(row["page"]) if row["page"] >= 0 else None
+        for field in ROW_FIELDS:
+            if row[field] >= 0:
+                record[field] = int(row[field])
+        if self.deleted[i]:
+            record["deleted"] = True
+        return record
+
+
+def _meta_path(store_dir: str) -> str:
+    return os.path.join(store_dir, META_FILE)
+
+
+def _vector_file_name(generation: int) -> str:
+    return f"vectors-{generation:06d}.bin"
+
+
+def _row_file_name(generation: int) -> str:
+    return f"rows-{generation:06d}.bin"
+
+
+def read_store_meta(store_dir: str) -> Optional[dict]:
+    path = _meta_path(store_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get("format") != STORE_FORMAT:
+        raise ValueError(f"{path} 不是向量库元数据文件")
+    if meta.get("version") != STORE_VERSION and meta.get("version") not in LEGACY_VERSIONS:
+        raise ValueError(f"不支持的向量库版本: {meta.get('version')}")
+    return meta
+
+
+def store_version_key(store_dir: str) -> Optional[tuple]:
+    """meta.json 的 (inode, mtime, size)；每次提交都会变化，可用于判断缓存是否过期。"""
+    try:
+        stat = os.stat(_meta_path(store_dir))
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _commit_meta(store_dir: str, meta: dict):
+    path = _meta_path(store_dir)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _remove_stale_files(store_dir: str, meta: dict):
+    keep = {meta["vector_file"], meta["row_file"]}
+    for name in os.listdir(store_dir):
+        if name.startswith(("vectors-", "rows-")) and name not in keep:
+            try:
+                os.remove(os.path.join(store_dir, name))
+            except OSError:
+                # 其他进程可能仍在 mmap 旧文件，下次写入时再清理
+                pass
+
+
+def source_path(store_dir: str, doc_id: str) -> str:
+    return os.path.join(store_dir, SOURCE_DIR, f"{doc_id}.txt")
+
+
+def staged_source_path(store_dir: str, doc_id: str) -> str:
+    """写入中的原文；提交记录时才在写锁内改名为 source_path，压缩不会把它当作无引用文件删除。"""
+    return f"{source_path(store_dir, doc_id)}.tmp"
+
+
+def _promote_staged_sources(store_dir: str, records: List[dict]):
+    for doc_id in {record["doc_id"] for record in records if "doc_id" in record}:
+        staged = staged_source_path(store_dir, doc_id)
+        if os.path.exists(staged):
+            os.replace(staged, source_path(store_dir, doc_id))
+
+
+def read_passage(store_dir: str, record: dict) -> str:
+    """按记录中的字节区间从原文件读出段落，不把整篇文档载入内存。"""
+    if "doc_id" not in record or "offset" not in record:
+        return ""
+    try:
+        with open(source_path(store_dir, record["doc_id"]), 'rb') as f:
+            f.seek(record["offset"])
+            return f.read(record["length"]).decode('utf-8', errors='ignore')
+    except FileNotFoundError:
+        return ""
+
+
+def _remove_unreferenced_sources(store_dir: str, documents: List[dict]):
+    directory = os.path.join(store_dir, SOURCE_DIR)
+    if not os.path.isdir(directory):
+        return
+    referenced = {f"{document['doc_id']}.txt" for document in documents
+                  if "doc_id" in document and not document.get("deleted")}
+    for name in os.listdir(directory):
+        if name.endswith(".txt") and name not in referenced:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def _new_meta(generation: int, dim: int, dtype: str) -> dict:
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"不支持的向量类型: {dtype}")
+    return {
+        "format": STORE_FORMAT,
+        "version": STORE_VERSION,
+        "generation": generation,
+        "dim": dim,
+        "dtype": dtype,
+        "vector_file": _vector_file_name(generation),
+        "row_file": _row_file_name(generation),
+        "count": 0,
+        "documents": []
+    }
+
+
+def _next_generation(store_dir: str) -> int:
+    meta = read_store_meta(store_dir)
+    return meta["generation"] + 1 if meta else 1
+
+
+def _encode_rows(documents: List[dict], records: List[dict]) -> np.ndarray:
+    """把记录转换为行数组；记录中的文档字段按 (名称, doc_id) 归并后追加到 documents。"""
+    rows = np.empty(len(records), dtype=ROW_DTYPE)
+    doc_index = {}
+    for i, record in enumerate(records):
+        key = (record["name"], record.get("doc_id"), bool(record.get("deleted")))
+        if key not in doc_index:
+            document = {"name": record["name"]}
+            for field in DOCUMENT_FIELDS:
+                if field in record:
+                    document[field] = record[field]
+            if record.get("deleted"):
+                document["deleted"] = True
+            doc_index[key] = len(documents)
+            documents.append(document)
+        page = record.get("page")
+        rows[i] = (doc_index[key], -1 if page is None else page,
+                   *(record.get(field, -1) for field in ROW_FIELDS))
+    return rows
+
+
+def _write_blocks(path: str, blocks, offset: int = 0):
+    with open(path, 'r+b' if offset and os.path.exists(path) else 'wb') as f:
+        # offset 之后可能残留上次中断写入的数据，直接覆盖
+        f.seek(offset)
+        for block in blocks:
+            f.write(np.ascontiguousarray(block).tobytes())
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def map_vectors(store_dir: str, meta: dict) -> np.ndarray:
+    count, dim = meta["count"], meta["dim"]
+    if count == 0:
+        return np.empty((0, dim), dtype=meta["dtype"])
+    path = os.path.join(store_dir, meta["vector_file"])
+    return np.memmap(path, dtype=meta["dtype"], mode='r', shape=(count, dim))
+
+
+def map_rows(store_dir: str, meta: dict) -> np.ndarray:
+    if meta["count"] == 0:
+        return np.empty(0, dtype=ROW_DTYPE)
+    path = os.path.join(store_dir, meta["row_file"])
+    return np.memmap(path, dtype=ROW_DTYPE, mode='r', shape=(meta["count"],))
+
+
+def load_embedding_store(store_dir: str) -> Tuple[StoreRecords, np.ndarray]:
+    """返回 (记录序列, 只读 mmap 向量矩阵)，行元数据和向量都不会被复制进内存。"""
+    meta = read_store_meta(store_dir)
+    if meta is None:
+        return StoreRecords(np.empty(0, dtype=ROW_DTYPE), []), np.empty((0, 0), dtype="float32")
+    if meta["version"] != STORE_VERSION:
+        with _write_lock:
+            meta = _upgrade_legacy(store_dir, read_store_meta(store_dir))
+    return StoreRecords(map_rows(store_dir, meta), meta["documents"]), map_vectors(store_dir, meta)
+
+
+def _upgrade_legacy(store_dir: str, meta: dict) -> dict:
+    """把 v1（逐行记录写在 meta.json 中）原样转换为 v2，向量文件沿用。调用方须持有 _write_lock。"""
+    if meta["version"] == STORE_VERSION:
+        return meta
+    new_meta = _new_meta(meta["generation"] + 1, meta["dim"], meta["dtype"])
+    new_meta["vector_file"] = meta["vector_file"]
+    rows = _encode_rows(new_meta["documents"], meta["records"])
+    _write_blocks(os.path.join(store_dir, new_meta["row_file"]), [rows])
+    new_meta["count"] = len(rows)
+    _commit_meta(store_dir, new_meta)
+    return new_meta
+
+
+def write_embedding_store(store_dir: str, records: List[dict], vectors, dim: int, dtype: str = "float32"):
+    """以新一代文件整体写入向量库。"""
+    with _write_lock:
+        _promote_staged_sources(store_dir, records)
+        return _write_generation(store_dir, records, vectors, dim, dtype)
+
+
+def _write_generation(store_dir: str, records: List[dict], vectors, dim: int, dtype: str):
+    os.makedirs(store_dir, exist_ok=True)
+    meta = _new_meta(_next_generation(store_dir), dim, dtype)
+    vectors = np.asarray(vectors, dtype=dtype).reshape(-1, dim)
+    if len(records) != len(vectors):
+        raise ValueError("记录数与向量数不一致")
+
+    rows = _encode_rows(meta["documents"], records)
+    _write_blocks(os.path.join(store_dir, meta["vector_file"]), [vectors])
+    _write_blocks(os.path.join(store_dir, meta["row_file"]), [rows])
+    meta["count"] = len(rows)
+    _commit_meta(store_dir, meta)
+    _remove_stale_files(store_dir, meta)
+    _remove_unreferenced_sources(store_dir, meta["documents"])
+    return meta
+
+
+def _append_rows(store_dir: str, meta: dict, records: List[dict], vectors: np.ndarray):
+    rows = _encode_rows(meta["documents"], records)
+    row_bytes = meta["dim"] * np.dtype(meta["dtype"]).itemsize
+    _write_blocks(os.path.join(store_dir, meta["vector_file"]), [vectors], meta["count"] * row_bytes)
+    _write_blocks(os.path.join(store_dir, meta["row_file"]), [rows], meta["count"] * ROW_DTYPE.itemsize)
+    meta["count"] += len(rows)
+    _commit_meta(store_dir, meta)
+    return meta
+
+
+def _compact(store_dir: str, meta: dict, deleted: np.ndarray, records: List[dict], vectors: np.ndarray):
+    old_vectors = map_vectors(store_dir, meta)
+    old_rows = map_rows(store_dir, meta)
+    live_rows = np.flatnonzero(~deleted)
+    new_meta = _new_meta(meta["generation"] + 1, meta["dim"], meta["dtype"])
+    # 丢弃已删除的文档，行中的文档下标随之重排
+    doc_map = np.full(len(meta["documents"]), -1, dtype=ROW_DTYPE["doc"])
+    for i, document in enumerate(meta["documents"]):
+        if not document.get("deleted"):
+            doc_map[i] = len(new_meta["documents"])
+            new_meta["documents"].append(document)
+
+    def kept_rows():
+        for start in range(0, len(live_rows), COMPACT_BLOCK_ROWS):
+            block = np.array(old_rows[live_rows[start:start + COMPACT_BLOCK_ROWS]])
+            block["doc"] = doc_map[block["doc"]]
+            yield block
+
+    new_rows = _encode_rows(new_meta["documents"], records)
+    _write_blocks(os.path.join(store_dir, new_meta["vector_file"]),
+                  [*(old_vectors[live_rows[start:start + COMPACT_BLOCK_ROWS]]
+                     for start in range(0, len(live_rows), COMPACT_BLOCK_ROWS)), vectors])
+    _write_blocks(os.path.join(store_dir, new_meta["row_file"]), [*kept_rows(), new_rows])
+    new_meta["count"] = len(live_rows) + len(new_rows)
+    _commit_meta(store_dir, new_meta)
+    _remove_stale_files(store_dir, new_meta)
+    _remove_unreferenced_sources(store_dir, new_meta["documents"])
+    return new_meta
+
+
+def upsert_embedding_store(store_dir: str, records: List[dict], vectors, dim: int, dtype: str = "float32", key: str = "name"):
+    """追加写入；与新记录 key 相同的旧文档被标记为 deleted，等价于原地替换。"""
+    with _write_lock:
+        _promote_staged_sources(store_dir, records)
+        meta = read_store_meta(store_dir)
+        if meta is None:
+            return _write_generation(store_dir, records, vectors, dim, dtype)
+        meta = _upgrade_legacy(store_dir, meta)
+
+        vectors = np.asarray(vectors, dtype=meta["dtype"]).reshape(-1, meta["dim"])
+        if len(records) != len(vectors):
+            raise ValueError("记录数与向量数不一致")
+
+        replaced_keys = {record[key] for record in records}
+        for document in meta["documents"]:
+            if not document.get("deleted") and document.get(key) in replaced_keys:
+                document["deleted"] = True
+
+        deleted = StoreRecords(map_rows(store_dir, meta), meta["documents"]).deleted
+        if deleted.sum() > COMPACT_DELETED_RATIO * (meta["count"] + len(records)):
+            return _compact(store_dir, meta, deleted, records, vectors)
+        return _append_rows(store_dir, meta, records, vectors)
+
+
+def migrate_embeddings_txt(txt_path: str, store_dir: str, dim: int, dtype: str = "float32"):
+    """把旧的 `名称\\t[json 向量]` 文本文件逐行转换为二进制向量库；向量库已存在时直接返回其 meta。"""
+    with _write_lock:
+        # 并发的调用方可能在加锁前都看到了“尚未迁移”，这里重新检查
+        meta = read_store_meta(store_dir)
+        if meta is not None:
+            return meta
+        return _migrate_txt(txt_path, store_dir, dim, dtype)
+
+
+def _migrate_txt(txt_path: str, store_dir: str, dim: int, dtype: str):
+    os.makedirs(store_dir, exist_ok=True)
+    meta = _new_meta(_next_generation(store_dir), dim, dtype)
+    records = []
+    with open(txt_path, 'r', encoding='utf-8') as src, \
+            open(os.path.join(store_dir, meta["vector_file"]), 'wb') as dst:
+        for line in src:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            name, embedding = line.rsplit('\t', 1)
+            vector = np.asarray(json.loads(embedding), dtype=dtype)
+            if vector.shape != (dim,):
+                raise ValueError(f"{name} 的向量维度为 {vector.shape}，应为 {dim}")
+            dst.write(vector.tobytes())
+            records.append({"name": name})
+        dst.flush()
+        os.fsync(dst.fileno())
+
+    rows = _encode_rows(meta["documents"], records)
+    _write_blocks(os.path.join(store_dir, meta["row_file"]), [rows])
+    meta["count"] = len(rows)
+    _commit_meta(store_dir, meta)
+    _remove_stale_files(store_dir, meta)
+    return meta
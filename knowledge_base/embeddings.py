@@ -0,0 +1,32 @@
+import numpy as np
+from typing import List
+from config.config import openai_api_key
+from knowledge_base.embedding_client import EmbeddingClient
+from knowledge_base.embedding_cache import EmbeddingCache
+from utils.resources import get_resource
+
+# 只依赖 numpy/requests 的轻量嵌入入口，语义缓存、题库等无需加载 faiss 和 PyMuPDF
+API_KEY = openai_api_key
+EMBEDDING_MODEL = "embedding-2"
+EMBEDDING_API_URL = "https://open.bigmodel.cn/api/paas/v4/embeddings"
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite3"
+EMBEDDING_CACHE_MAX_ENTRIES = 200000
+
+def get_embedding_cache() -> EmbeddingCache:
+    return get_resource("embedding_cache", lambda: EmbeddingCache(EMBEDDING_CACHE_FILE, EMBEDDING_CACHE_MAX_ENTRIES))
+
+def get_embedding_client() -> EmbeddingClient:
+    return get_resource(
+        "embedding_client",
+        lambda: EmbeddingClient(EMBEDDING_API_URL, API_KEY, EMBEDDING_MODEL, cache=get_embedding_cache())
+    )
+
+def get_embedding(text: str) -> List[float]:
+    return get_embedding_client().embed([text])[0]
+
+def get_embeddings_for_long_text(text: str) -> List[float]:
+    max_length = 512
+    segments = [text[i:i+max_length] for i in range(0, len(text), max_length)]
+    embeddings = get_embedding_client().embed(segments)
+    avg_embedding = np.mean(embeddings, axis=0).tolist()
+    return avg_embedding
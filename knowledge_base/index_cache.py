@@ -0,0 +1,56 @@
+import threading
+from typing import Callable, Dict, List, NamedTuple, Tuple
+from knowledge_base.embedding_store import store_version_key
+
+# 进程级索引缓存：所有 Streamlit 会话共享同一个索引对象，
+# 只有向量库的 meta.json 发生变化时才重建。
+# 重建期间其他线程继续使用旧索引，新索引构建完成后整体替换引用。
+
+
+class IndexSnapshot(NamedTuple):
+    key: tuple
+    records: List[dict]
+    index: object
+
+
+_snapshots: Dict[str, IndexSnapshot] = {}
+_build_lock = threading.Lock()
+
+
+def _rebuild(store_dir: str, load_fn: Callable, build_fn: Callable, force: bool) -> IndexSnapshot:
+    snapshot = _snapshots.get(store_dir)
+    key = store_version_key(store_dir)
+    if not force and snapshot is not None and snapshot.key == key:
+        # 等锁期间已被其他线程重建
+        return snapshot
+    records, vectors = load_fn(store_dir)
+    snapshot = IndexSnapshot(key, records, build_fn(vectors))
+    _snapshots[store_dir] = snapshot
+    return snapshot
+
+
+def get_cached_index(store_dir: str, load_fn: Callable, build_fn: Callable) -> Tuple[List[dict], object]:
+    snapshot = _snapshots.get(store_dir)
+    if snapshot is not None and snapshot.key == store_version_key(store_dir):
+        return snapshot.records, snapshot.index
+
+    if snapshot is not None and not _build_lock.acquire(blocking=False):
+        # 另一个线程正在重建，先返回旧索引而不是阻塞查询
+        return snapshot.records, snapshot.index
+    if snapshot is None:
+        _build_lock.acquire()
+    try:
+        snapshot = _rebuild(store_dir, load_fn, build_fn, force=False)
+    finally:
+        _build_lock.release()
+    return snapshot.records, snapshot.index
+
+
+def refresh_cached_index(store_dir: str, load_fn: Callable, build_fn: Callable):
+    """写入向量库后立即构建新索引并原子替换，查询方无需等待下一次过期检查。"""
+    with _build_lock:
+        _rebuild(store_dir, load_fn, build_fn, force=True)
+
+
+def invalidate_cached_index(store_dir: str):
+    _snapshots.pop(store_dir, None)
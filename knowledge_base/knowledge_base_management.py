@@ -1,80 +1,139 @@
 import os
-import requests
-import json
+import hashlib
 import numpy as np
 import streamlit as st
 import faiss
-import chardet
-import fitz  # PyMuPDF
-from typing import List, Tuple
-from config.config import openai_api_key
-
-API_KEY = openai_api_key
-EMBEDDING_MODEL = "embedding-2"
-EMBEDDING_API_URL = "https://open.bigmodel.cn/api/paas/v4/embeddings"
+from typing import Iterable, List, Optional, Tuple
+from knowledge_base.embedding_store import StoreRecords, read_store_meta, load_embedding_store, upsert_embedding_store, migrate_embeddings_txt, staged_source_path, read_passage
+from knowledge_base.chunking import split_text
+from knowledge_base.ann_index import build_index, search_excluding
+from knowledge_base.document_reader import iter_pdf_pages, iter_text_blocks, READ_BLOCK_SIZE
+from knowledge_base.embeddings import get_embeddings_for_long_text, get_embedding_client, get_embedding_cache
+from knowledge_base.index_cache import get_cached_index, refresh_cached_index
+from config.config import CHUNK_SIZE, CHUNK_OVERLAP, INDEX_TYPE, INDEX_PARAMS
+
 VECTOR_DIMENSION = 1024
-EMBEDDING_FILE = "embeddings.txt"
-
-def get_embedding(text: str) -> List[float]:
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {API_KEY}"
-    }
-    payload = {
-        "model": EMBEDDING_MODEL,
-        "input": text
-    }
-    response = requests.post(EMBEDDING_API_URL, headers=headers, data=json.dumps(payload))
-    response.raise_for_status()
-    data = response.json()
-    return data["data"][0]["embedding"]
-
-def get_embeddings_for_long_text(text: str) -> List[float]:
-    max_length = 512
-    segments = [text[i:i+max_length] for i in range(0, len(text), max_length)]
-    embeddings = []
-    for segment in segments:
-        embedding = get_embedding(segment)
-        embeddings.append(embedding)
-    avg_embedding = np.mean(embeddings, axis=0).tolist()
-    return avg_embedding
-
-def store_embeddings_to_file(embeddings: List[Tuple[str, List[float]]], file_path: str):
-    with open(file_path, 'w', encoding='utf-8') as f:
-        for text, embedding in embeddings:
-            f.write(f"{text}\t{json.dumps(embedding)}\n")
-
-def load_embeddings_from_file(file_path: str) -> List[Tuple[str, List[float]]]:
-    embeddings = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            text, embedding = line.strip().split('\t')
-            embeddings.append((text, json.loads(embedding)))
-    return embeddings
-
-def build_faiss_index(embeddings: List[Tuple[str, List[float]]]) -> faiss.IndexFlatL2:
-    index = faiss.IndexFlatL2(VECTOR_DIMENSION)
-    vectors = np.array([embedding for _, embedding in embeddings]).astype('float32')
-    index.add(vectors)
-    return index
-
-def search_similar_texts(query_embedding: List[float], embeddings: List[Tuple[str, List[float]]], index: faiss.IndexFlatL2, top_k: int = 5) -> List[Tuple[str, float]]:
+EMBEDDING_FILE = "embeddings.txt"  # 旧版文本格式，仅用于一次性迁移
+EMBEDDING_STORE_DIR = "embedding_store"
+EMBEDDING_STORE_DTYPE = "float32"  # 可设为 "float16" 以减半磁盘和内存占用
+EMBED_BATCH_CHUNKS = 256  # 每累积这么多块就请求一次嵌入，避免整篇文档的块文本同时驻留内存
+
+def compute_content_hash(uploaded_file) -> str:
+    digest = hashlib.sha256()
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(READ_BLOCK_SIZE), b''):
+        digest.update(block)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+def embed_document(name: str, content_hash: str, pages: Iterable[Tuple[Optional[int], str]],
+                   store_dir: str = EMBEDDING_STORE_DIR) -> Tuple[List[dict], np.ndarray]:
+    """逐页切块并嵌入，同时把全文暂存到 sources/，返回每个块的记录和向量。
+
+    暂存的原文在 store_embeddings 提交记录时才生效。
+
+    页码为 None 的连续文本块（纯文本文件）视为同一页，start/end 按文档累计。
+    """
+    path = staged_source_path(store_dir, content_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    records, vectors, pending = [], [], []
+
+    def flush():
+        if pending:
+            vectors.append(np.asarray(get_embedding_client().embed(pending), dtype='float32'))
+            pending.clear()
+
+    try:
+        with open(path, 'wb') as source:
+            page_offset = 0
+            previous_page, char_base = None, 0
+            for page, text in pages:
+                if page != previous_page:
+                    previous_page, char_base = page, 0
+                encoded = text.encode('utf-8')
+                char_pos, byte_pos = 0, 0
+                for start, end in split_text(text, CHUNK_SIZE, CHUNK_OVERLAP):
+                    # 块起点单调递增，增量换算字符偏移到字节偏移
+                    byte_pos += len(text[char_pos:start].encode('utf-8'))
+                    char_pos = start
+                    chunk = text[start:end]
+                    records.append({
+                        "doc_id": content_hash,
+                        "name": name,
+                        "content_hash": content_hash,
+                        "page": page,
+                        "start": char_base + start,
+                        "end": char_base + end,
+                        "offset": page_offset + byte_pos,
+                        "length": len(chunk.encode('utf-8'))
+                    })
+                    pending.append(chunk)
+                    if len(pending) >= EMBED_BATCH_CHUNKS:
+                        flush()
+                source.write(encoded)
+                page_offset += len(encoded)
+                char_base += len(text)
+            flush()
+    except BaseException:
+        os.remove(path)
+        raise
+
+    if not records:
+        os.remove(path)
+        raise ValueError("文件中没有可提取的文本")
+    return records, np.vstack(vectors)
+
+def store_embeddings(records: List[dict], vectors: np.ndarray, store_dir: str = EMBEDDING_STORE_DIR):
+    # 同名文件的旧块被替换，其余知识库内容保持不变
+    upsert_embedding_store(store_dir, records, vectors, VECTOR_DIMENSION, EMBEDDING_STORE_DTYPE)
+
+def load_knowledge_base(store_dir: str = EMBEDDING_STORE_DIR) -> Tuple[StoreRecords, np.ndarray]:
+    if read_store_meta(store_dir) is None and os.path.exists(EMBEDDING_FILE):
+        migrate_embeddings_txt(EMBEDDING_FILE, store_dir, VECTOR_DIMENSION, EMBEDDING_STORE_DTYPE)
+    return load_embedding_store(store_dir)
+
+def list_documents(store_dir: str = EMBEDDING_STORE_DIR) -> List[dict]:
+    records, _ = load_knowledge_base(store_dir)
+    chunks = np.bincount(records.rows["doc"], minlength=len(records.documents))
+    return [{
+        "name": document["name"],
+        "content_hash": document.get("content_hash"),
+        "chunks": int(chunks[i])
+    } for i, document in enumerate(records.documents) if not document.get("deleted")]
+
+def build_faiss_index(vectors: np.ndarray) -> faiss.Index:
+    return build_index(vectors, VECTOR_DIMENSION, INDEX_TYPE, **INDEX_PARAMS)
+
+def get_knowledge_base_index(store_dir: str = EMBEDDING_STORE_DIR) -> Tuple[StoreRecords, faiss.Index]:
+    return get_cached_index(store_dir, load_knowledge_base, build_faiss_index)
+
+def refresh_knowledge_base_index(store_dir: str = EMBEDDING_STORE_DIR):
+    refresh_cached_index(store_dir, load_knowledge_base, build_faiss_index)
+
+def search_similar_texts(query_embedding: List[float], records: StoreRecords, index: faiss.Index, top_k: int = 5,
+                         store_dir: str = EMBEDDING_STORE_DIR) -> List[dict]:
     query_vector = np.array(query_embedding).reshape(1, -1).astype('float32')
-    distances, indices = index.search(query_vector, top_k)
-    return [(embeddings[idx][0], distances[0][i]) for i, idx in enumerate(indices[0])]
-
-def read_file_content(uploaded_file):
-    raw_data = uploaded_file.read()
-    result = chardet.detect(raw_data)
-    encoding = result['encoding'] if result['encoding'] else 'utf-8'
-    return raw_data.decode(encoding, errors='ignore')
-
-def read_pdf_content(uploaded_file):
-    doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-    content = ""
-    for page in doc:
-        content += page.get_text()
-    return content
+    # 被替换的旧记录仍在索引中，检索时直接跳过
+    distances, indices = search_excluding(index, query_vector, top_k, np.flatnonzero(records.deleted))
+    # 知识库条目少于 top_k 时 faiss 以 -1 填充
+    matches = [(idx, distances[0][i]) for i, idx in enumerate(indices[0]) if idx >= 0]
+    hits = []
+    # 只为最终返回的块构造记录并读取原文
+    for idx, distance in matches:
+        record = records[idx]
+        hits.append({
+            "name": record["name"],
+            "page": record.get("page"),
+            "distance": float(distance),
+            "text": read_passage(store_dir, record)
+        })
+    return hits
+
+def format_search_hit(hit: dict) -> str:
+    location = f"文件名: {hit['name']}"
+    if hit["page"] is not None:
+        location += f", 第 {hit['page']} 页"
+    return f"{location}, 相似度: {hit['distance']}"
 
 def knowledge_base_management_method():
     st.title("知识库管理")
@@ -84,21 +143,28 @@ def knowledge_base_management_method():
         uploaded_files = st.file_uploader("选择文件上传", accept_multiple_files=True, type=["txt", "pdf"])
         if st.button("处理文件"):
             if uploaded_files:
-                embeddings = []
+                stored = False
+                known_hashes = {record.get("content_hash") for record in list_documents()}
                 with st.spinner("正在处理文件..."):
                     for uploaded_file in uploaded_files:
                         try:
+                            content_hash = compute_content_hash(uploaded_file)
+                            if content_hash in known_hashes:
+                                st.info(f"文件 {uploaded_file.name} 未变化，已跳过。")
+                                continue
+                            known_hashes.add(content_hash)
                             if uploaded_file.name.endswith(".pdf"):
-                                content = read_pdf_content(uploaded_file)
+                                pages = iter_pdf_pages(uploaded_file)
                             else:
-                                content = read_file_content(uploaded_file)
-                            embedding = get_embeddings_for_long_text(content)
-                            embeddings.append((uploaded_file.name, embedding))
-                            st.success(f"文件 {uploaded_file.name} 已处理。")
+                                pages = iter_text_blocks(uploaded_file)
+                            records, vectors = embed_document(uploaded_file.name, content_hash, pages)
+                            store_embeddings(records, vectors)
+                            stored = True
+                            st.success(f"文件 {uploaded_file.name} 已处理，共 {len(records)} 个片段。")
                         except Exception as e:
                             st.error(f"处理文件 {uploaded_file.name} 时发生错误: {str(e)}")
-                if embeddings:
-                    store_embeddings_to_file(embeddings, EMBEDDING_FILE)
+                if stored:
+                    refresh_knowledge_base_index()
                     st.success("所有文件已处理并存储嵌入向量。")
             else:
                 st.warning("请上传文件。")
@@ -108,24 +174,24 @@ def knowledge_base_management_method():
         if st.button("搜索"):
             if query_text:
                 with st.spinner("正在搜索..."):
-                    embeddings = load_embeddings_from_file(EMBEDDING_FILE)
-                    index = build_faiss_index(embeddings)
+                    records, index = get_knowledge_base_index()
                     query_embedding = get_embeddings_for_long_text(query_text)
-                    results = search_similar_texts(query_embedding, embeddings, index)
+                    results = search_similar_texts(query_embedding, records, index)
                     st.write("搜索结果:")
-                    for result in results:
-                        st.write(f"文件名: {result[0]}, 相似度: {result[1]}")
+                    for hit in results:
+                        st.write(format_search_hit(hit))
+                        st.caption(hit["text"])
             else:
                 st.warning("请输入查询文本。")
     
     elif option == "查看知识库":
-        embeddings = load_embeddings_from_file(EMBEDDING_FILE)
         st.write("现有知识库内容:")
-        for text, _ in embeddings:
-            st.write(f"文件名: {text}")
+        for document in list_documents():
+            st.write(f"文件名: {document['name']}, 片段数: {document['chunks']}")
+        cache_stats = get_embedding_cache().stats()
+        st.caption(f"嵌入缓存: {cache_stats['entries']} 条, 命中 {cache_stats['hits']} 次, 未命中 {cache_stats['misses']} 次, 命中率 {cache_stats['hit_rate']:.0%}")
 
-def search_local_knowledge_base(query_embedding: List[float], top_k: int = 5) -> List[Tuple[str, float]]:
-    embeddings = load_embeddings_from_file(EMBEDDING_FILE)
-    index = build_faiss_index(embeddings)
-    return search_similar_texts(query_embedding, embeddings, index, top_k)
+def search_local_knowledge_base(query_embedding: List[float], top_k: int = 5) -> List[dict]:
+    records, index = get_knowledge_base_index()
+    return search_similar_texts(query_embedding, records, index, top_k)
 
@@ -1,11 +1,8 @@
 import streamlit as st
-from methods.simulate_teaching import simulate_teaching_method
-from methods.interactive_teaching import interactive_teaching_method
-from methods.exercise_teaching import exercise_teaching_method
-from methods.knowledge_summary import knowledge_summary_method
-from methods.assessment_teaching import assessment_teaching_method
-from knowledge_base.knowledge_base_management import knowledge_base_management_method
+from methods import TEACHING_METHODS, KNOWLEDGE_BASE_PAGE
 from utils.css_styles import apply_css_styles
+from utils.startup_report import import_page, page_import_times
+from utils.resources import resource_creation_times
 
 # 设置页面配置
 st.set_page_config(
@@ -33,28 +30,23 @@ def main():
     if section == "教学模式":
         method = st.sidebar.selectbox(
             "请选择一种教学方法",
-            [
-                "模拟教学方法",
-                "互动式教学方法",
-                "练习式教学方法",
-                "知识总结式教学方法",
-                "评估式教学方法"
-            ],
+            list(TEACHING_METHODS),
             format_func=lambda x: f"📘 {x}"  # 添加图标
         )
-
-        if method == "模拟教学方法":
-            simulate_teaching_method()
-        elif method == "互动式教学方法":
-            interactive_teaching_method()
-        elif method == "练习式教学方法":
-            exercise_teaching_method()
-        elif method == "知识总结式教学方法":
-            knowledge_summary_method()
-        elif method == "评估式教学方法":
-            assessment_teaching_method()
+        # 只导入选中的页面，faiss、PyMuPDF、networkx 等依赖按需加载
+        import_page(*TEACHING_METHODS[method])()
     elif section == "知识库管理":
-        knowledge_base_management_method()
+        import_page(*KNOWLEDGE_BASE_PAGE)()
+
+    show_startup_report()
+
+def show_startup_report():
+    with st.sidebar.expander("启动耗时"):
+        for module_name, (seconds, modules) in page_import_times().items():
+            st.caption(f"{module_name}: {seconds * 1000:.0f} ms，新加载 {modules} 个模块")
+        for name, seconds in resource_creation_times().items():
+            st.caption(f"资源 {name}: {seconds * 1000:.0f} ms")
+        st.caption("各模块冷启动明细：python -m utils.startup_report")
 
 if __name__ == "__main__":
     main()
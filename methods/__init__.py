@@ -0,0 +1,9 @@
+# 教学方法页面：名称 -> (模块, 入口函数)。main.py 只在选中某个页面时才导入对应模块
+TEACHING_METHODS = {
+    "模拟教学方法": ("methods.simulate_teaching", "simulate_teaching_method"),
+    "互动式教学方法": ("methods.interactive_teaching", "interactive_teaching_method"),
+    "练习式教学方法": ("methods.exercise_teaching", "exercise_teaching_method"),
+    "知识总结式教学方法": ("methods.knowledge_summary", "knowledge_summary_method"),
+    "评估式教学方法": ("methods.assessment_teaching", "assessment_teaching_method"),
+}
+KNOWLEDGE_BASE_PAGE = ("knowledge_base.knowledge_base_management", "knowledge_base_management_method")
@@ -1,28 +1,21 @@
 import streamlit as st
-from zhipuai import ZhipuAI
-from config.config import openai_api_key
 from utils.context_manager import add_to_chat_history
+from utils.llm_gateway import get_gateway
+from utils.streaming import render_stream
 
-client = ZhipuAI(api_key=openai_api_key)
-
-def assess_content(content):
+def assess_content(content, placeholder=None, on_update=None):
     prompt = f"请评估以下内容，并为其打分（1到10分），指出不足之处并提供改进方向：\n\n{content}"
     messages = [
         {'role': 'system', 'content': "你是一名经验丰富的老师，擅长评估和改进学生的写作内容。"},
         {'role': 'user', 'content': prompt}
     ]
 
-    response = client.chat.completions.create(
+    result = render_stream(get_gateway().stream(
         # model="glm-3-turbo",
         model="glm-4-0520",
         messages=messages,
-        stream=True,
-    )
-
-    result = ""
-    for chunk in response:
-        if hasattr(chunk.choices[0], 'delta'):
-            result += chunk.choices[0].delta.content
+        cache="assess_content",
+    ), placeholder, on_update)
 
     add_to_chat_history('assistant', result)
     return result
@@ -44,12 +37,17 @@ def assessment_teaching_method():
     content_input = st.text_area("撰写内容")
 
     if st.button("评估内容"):
-        with st.spinner("正在评估..."):
-            assessment_result = assess_content(content_input)
-            st.write("评估结果：")
-            score = extract_score(assessment_result)
+        st.write("评估结果：")
+        score_placeholder = st.empty()
+        result_placeholder = st.empty()
+        result_placeholder.markdown("正在评估...")
+
+        def show_score(partial_result):
+            # 评分一出现在已生成的文本中就显示星级，不必等待全文
+            score = extract_score(partial_result)
             if score is not None:
                 stars = display_stars(score)
-                st.markdown(f"**评分：** {stars} ({score}/10)")
-            st.write(assessment_result)
+                score_placeholder.markdown(f"**评分：** {stars} ({score}/10)")
+
+        assess_content(content_input, result_placeholder, show_score)
 
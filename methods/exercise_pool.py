@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.split())
+
+
+class QuestionPool:
+    """按主题预生成的练习题池，所有会话共享。
+
+    generate_fn(topic, count) 一次生成一批题目。取题后若剩余不足 low_watermark，
+    在后台补充一批；池为空时等待正在进行的补充（或立即发起一次）。
+    """
+
+    def __init__(self, generate_fn: Callable[[str, int], List[dict]], batch_size: int = 5,
+                 low_watermark: int = 2, max_topics: int = 256, max_workers: int = 2):
+        self.generate_fn = generate_fn
+        self.batch_size = batch_size
+        self.low_watermark = low_watermark
+        self.max_topics = max_topics
+        self._pools = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exercise-pool")
+
+    def _generate(self, key: str, topic: str):
+        try:
+            questions = self.generate_fn(topic, self.batch_size)
+            with self._lock:
+                self._pools.setdefault(key, deque()).extend(questions)
+                self._pools.move_to_end(key)
+                while len(self._pools) > self.max_topics:
+                    self._pools.popitem(last=False)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refill_locked(self, key: str, topic: str):
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._executor.submit(self._generate, key, topic)
+            self._inflight[key] = future
+        return future
+
+    def prefetch(self, topic: str):
+        """池中题目不足时在后台补充，用户输入主题后即可调用。"""
+        key = normalize_topic(topic)
+        with self._lock:
+            if len(self._pools.get(key, ())) < self.low_watermark:
+                self._refill_locked(key, topic)
+
+    def take(self, topic: str, timeout: Optional[float] = None) -> Optional[dict]:
+        key = normalize_topic(topic)
+        for _ in range(2):
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool:
+                    question = pool.popleft()
+                    if len(pool) < self.low_watermark:
+                        self._refill_locked(key, topic)
+                    return question
+                future = self._refill_locked(key, topic)
+            # 生成失败时异常在这里抛给调用方
+            future.result(timeout=timeout)
+        return None
+
+    def size(self, topic: str) -> int:
+        with self._lock:
+            return len(self._pools.get(normalize_topic(topic), ()))
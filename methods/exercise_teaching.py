@@ -1,87 +1,144 @@
+import json
 import streamlit as st
-from zhipuai import ZhipuAI
-from config.config import openai_api_key
 from utils.context_manager import add_to_chat_history
+from utils.llm_gateway import get_gateway
+from methods.exercise_pool import QuestionPool
+from methods.question_bank import QuestionBank
+from config.config import QUESTION_BANK_FILE, QUESTION_TOPIC_SIMILARITY, QUESTION_DUPLICATE_SIMILARITY
+from knowledge_base.embeddings import get_embedding_client
+from utils.resources import get_resource
 import re
 
-client = ZhipuAI(api_key=openai_api_key)
+QUESTION_BATCH_SIZE = 5
+OPTION_LABELS = ['A', 'B', 'C', 'D']
 
-def fetch_question_from_api(notes_input):
-    prompt = f"根据'{notes_input}',帮我为小红书博主的关键知识点生成1个带选项的练习题，使用练习式教学方法，只需要问题。"
+def fetch_questions_from_api(notes_input, count):
+    prompt = f"根据'{notes_input}',帮我为小红书博主的关键知识点生成{count}个各不相同的带选项的练习题，使用练习式教学方法。"
     messages = [
         {'role': 'system', 'content': """
         你是一名小红书博主导师。
         # OutputFormat :
-       "question":
-        "options": []
+        只输出一个 JSON 数组，不要输出其他内容，每个元素格式为：
+        {"question": "题干", "options": ["选项1", "选项2", "选项3", "选项4"], "answer": "A"}
+        options 固定 4 个且不带 A. 等前缀，answer 为正确选项的字母。
         """},
         {'role': 'user', 'content': prompt}
     ]
 
-    response = client.chat.completions.create(
+    result = get_gateway().complete(
         # model="glm-3-turbo",
         model="glm-4-0520",
-        messages=messages,
-        stream=True,
+        messages=messages
     )
 
-    result = ""
-    for chunk in response:
-        if hasattr(chunk.choices[0], 'delta'):
-            result += chunk.choices[0].delta.content
-
     add_to_chat_history('assistant', result)
     return result
 
-def parse_question_response(response):
-    # Custom parsing logic for the API response
-    try:
-        # Extract question
-        question_start = response.find("问题:") + len("问题:")
-        question_end = response.find("A.")
-        question = response[question_start:question_end].strip()
+def repair_questions_response(response):
+    # 解析失败时让便宜的模型只做格式修正，而不是重新出题
+    messages = [
+        {'role': 'user', 'content': f"把下面的内容整理为合法的 JSON 数组，元素格式为 "
+                                    f"{{\"question\": \"\", \"options\": [\"\", \"\", \"\", \"\"], \"answer\": \"A\"}}，"
+                                    f"只输出 JSON：\n\n{response}"}
+    ]
+    return get_gateway().complete(model="glm-4-flash", messages=messages)
 
-        # Remove leading colon if present
-        if question.startswith("："):
-            question = question[1:].strip()
+def validate_question(item):
+    if not isinstance(item, dict):
+        return None
+    question = str(item.get("question", "")).strip()
+    options = item.get("options")
+    answer = str(item.get("answer", "")).strip().upper()[:1]
+    if not question or not isinstance(options, list) or len(options) != len(OPTION_LABELS):
+        return None
+    # 去掉模型仍然加上的 “A.”、“B、” 等前缀
+    options = [re.sub(r'^[A-Da-d]\s*[.．、:：)）]\s*', '', str(option)).strip() for option in options]
+    if not all(options) or answer not in OPTION_LABELS:
+        return None
+    return {"question": question, "options": options, "answer": answer}
 
-        # Remove all symbols except question mark
-        question = re.sub(r'[^\w\s？]', '', question)
+def parse_questions_response(response):
+    """解析 JSON 数组并逐题校验，返回合法题目列表；整体不是合法 JSON 时抛出 ValueError。"""
+    text = re.sub(r'^```(?:json)?|```$', '', response.strip(), flags=re.MULTILINE).strip()
+    start, end = text.find('['), text.rfind(']')
+    if start < 0 or end < start:
+        raise ValueError("响应中没有 JSON 数组")
+    try:
+        items = json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON 格式错误: {e}")
+    return [question for question in map(validate_question, items) if question]
 
-        # Extract options
-        options_str = response[question_end:].strip()
-        options = options_str.split(' ')
-        options = [opt.strip() for opt in options_str.split(' ') if opt]
+def generate_questions(notes_input, count):
+    response = fetch_questions_from_api(notes_input, count)
+    try:
+        questions = parse_questions_response(response)
+    except ValueError:
+        questions = []
+    if not questions:
+        questions = parse_questions_response(repair_questions_response(response))
+    # 与题库中已有题目重复的不再进入题池
+    return get_question_bank().add(notes_input, questions)
 
-        option_labels = ['A.', 'B.', 'C.', 'D.']
-        formatted_options = []
+def embed_texts(texts):
+    return get_embedding_client().embed(texts)
 
-        for label in option_labels:
-            start = options_str.find(label)
-            end = options_str.find(option_labels[option_labels.index(label) + 1]) if option_labels.index(label) + 1 < len(option_labels) else len(options_str)
-            formatted_options.append(options_str[start:end].strip())
+def get_question_bank():
+    return get_resource("question_bank", lambda: QuestionBank(
+        QUESTION_BANK_FILE,
+        embed_texts,
+        topic_threshold=QUESTION_TOPIC_SIMILARITY,
+        duplicate_threshold=QUESTION_DUPLICATE_SIMILARITY
+    ))
 
-        # Remove duplicate letters in options
-        formatted_options = [opt[2:].strip() if opt.startswith(tuple(option_labels)) else opt for opt in formatted_options]
+def get_question_pool():
+    return get_resource("question_pool", lambda: QuestionPool(generate_questions, batch_size=QUESTION_BATCH_SIZE))
 
-        return question, formatted_options
-    except Exception as e:
-        st.error("解析问题时出错: 无法解析响应")
-        st.error(f"错误信息: {e}")
-        return None, None
+def next_question(notes_input, seen):
+    """优先从题库取当前会话没做过的题，没有时再从题池（即大模型生成）取。"""
+    question = get_question_bank().find_unseen(notes_input, seen)
+    if question is not None:
+        return question
+    # 题池中的题目也已入库，可能刚通过题库做过，跳过即可；嵌入失败时题目没有 id，无法去重，直接出题
+    for _ in range(QUESTION_BATCH_SIZE + 1):
+        question = get_question_pool().take(notes_input)
+        if question is None or question.get("id") is None or question["id"] not in seen:
+            return question
+    return None
 
 def exercise_teaching_method():
     st.title("小红书博主练习题")
     notes_input = st.text_input("请输入你想练习的内容:", "")
+    seen = st.session_state.setdefault("seen_question_ids", set())
+    question_pool = get_question_pool()
+    if notes_input and get_question_bank().count_unseen(notes_input, seen) < question_pool.low_watermark:
+        # 题库中没做过的题不够时，才在后台让大模型准备新题
+        question_pool.prefetch(notes_input)
+
     if st.button("生成练习题"):
+        st.session_state.exercise = None
+        st.session_state.exercise_choice = None
         with st.spinner("正在生成练习题..."):
-            response = fetch_question_from_api(notes_input)
-            if response:
-                question, options = parse_question_response(response)
-                if question and options:
-                    st.write(question)
-                    for index, option in enumerate(options, 1):
-                        if st.button(f"{chr(64 + index)}. {option}"):
-                            st.write(f"你选择了: {chr(64 + index)}")
+            try:
+                st.session_state.exercise = next_question(notes_input, seen)
+                if st.session_state.exercise is None:
+                    st.error("没有新的练习题，请稍后重试或换一个练习内容。")
+                elif st.session_state.exercise.get("id") is not None:
+                    seen.add(st.session_state.exercise["id"])
+            except Exception as e:
+                st.error(f"生成练习题时出错: {e}")
+
+    exercise = st.session_state.get("exercise")
+    if exercise:
+        st.write(exercise["question"])
+        for label, option in zip(OPTION_LABELS, exercise["options"]):
+            if st.button(f"{label}. {option}", key=f"exercise_option_{label}"):
+                st.session_state.exercise_choice = label
+
+        choice = st.session_state.get("exercise_choice")
+        if choice:
+            st.write(f"你选择了: {choice}")
+            if choice == exercise["answer"]:
+                st.success("回答正确！")
             else:
-                st.error("API 响应为空，请检查 API 请求。")
+                st.error(f"回答错误，正确答案是 {exercise['answer']}。")
@@ -1,26 +1,34 @@
 import streamlit as st
-from zhipuai import ZhipuAI
-from config.config import openai_api_key
 from utils.context_manager import add_to_chat_history
+from utils.llm_gateway import get_gateway
+from utils.context_compactor import ContextCompactor
+from utils.session_persistence import restore_session_state, persist_session_state
 
-client = ZhipuAI(api_key=openai_api_key)
+KEEP_TURNS = 4  # 原文保留的最近对话轮数，更早的对话并入摘要
+SUMMARY_MODEL = "glm-4-flash"
 
 def fetch_response_from_api(user_input, chat_history):
     messages = chat_history + [
         {'role': 'user', 'content': user_input}
     ]
 
-    response = client.chat.completions.create(
+    result = get_gateway().complete(
         # model="glm-3-turbo",
         model="glm-4-0520",
         messages=messages
     )
 
-    result = response.choices[0].message.content  # Correctly access response content
-
     add_to_chat_history('assistant', result)
     return result
 
+def summarize_turns(summary, messages):
+    transcript = "\n".join(
+        f"{'用户' if m['role'] == 'user' else '导师'}: {m['content']}" for m in messages
+    )
+    prompt = (f"已有摘要：{summary or '无'}\n\n新增对话：\n{transcript}\n\n"
+              f"请把新增对话并入摘要，保留用户扮演的角色设定、讨论过的问题和得出的结论，不超过300字，只输出摘要。")
+    return get_gateway().complete(model=SUMMARY_MODEL, messages=[{'role': 'user', 'content': prompt}])
+
 def render_chat_bubble(chat, role):
     if role == 'user':
         st.markdown(
@@ -41,9 +49,18 @@ def render_chat_bubble(chat, role):
             unsafe_allow_html=True
         )
 
+def get_compactor():
+    if "context_compactor" not in st.session_state:
+        compactor = ContextCompactor(summarize_turns, keep_turns=KEEP_TURNS)
+        # 刷新页面后接着使用已保存的摘要，不必从头重新摘要
+        compactor.restore(st.session_state.get("context_summary", {}))
+        st.session_state.context_compactor = compactor
+    return st.session_state.context_compactor
+
 def interactive_teaching_method():
     st.title("互动式教学方法")
 
+    restore_session_state(["chat_history", "started", "context_summary"])
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
         st.session_state.started = False
@@ -55,13 +72,15 @@ def interactive_teaching_method():
                 st.session_state.chat_history = [
                     {'role': 'system', 'content': "你是一个小红书博主教学专家，用户现在要通过角色扮演的方式——互动式教学方法来学习小红书博主。"}
                 ]
+                st.session_state.context_summary = {}
+                st.session_state.pop("context_compactor", None)
                 initial_response = fetch_response_from_api(initial_prompt, st.session_state.chat_history)
                 st.session_state.chat_history.append({
                     'role': 'assistant',
                     'content': initial_response
                 })
                 st.session_state.started = True
-                st.experimental_rerun()  # Rerun to update the interface
+                st.rerun()  # Rerun to update the interface
 
     if st.session_state.started:
         for chat in st.session_state.chat_history:
@@ -76,10 +95,18 @@ def interactive_teaching_method():
             if user_input:
                 with st.spinner("正在生成回复..."):
                     chat_history = st.session_state.chat_history
-                    response = fetch_response_from_api(user_input, chat_history)
+                    compactor = get_compactor()
+                    # 只发送摘要加最近几轮原文，长会话的每轮耗时和费用保持平稳
+                    response = fetch_response_from_api(user_input, compactor.build_messages(chat_history))
                     if response:
                         chat_history.append({"role": "user", "content": user_input})
                         chat_history.append({"role": "assistant", "content": response})
                         st.session_state.chat_history = chat_history
-                        st.experimental_rerun()  # Rerun to update the interface
+                        compactor.refresh(chat_history)
+                        st.rerun()  # Rerun to update the interface
 
+        persist_session_state({
+            "chat_history": st.session_state.chat_history,
+            "started": True,
+            "context_summary": get_compactor().state()
+        })
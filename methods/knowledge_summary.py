@@ -1,16 +1,19 @@
 import streamlit as st
 import networkx as nx
-import plotly.graph_objects as go
-from zhipuai import ZhipuAI
-from config.config import openai_api_key
 from utils.context_manager import add_to_chat_history
-from knowledge_base.knowledge_base_management import search_local_knowledge_base, get_embeddings_for_long_text
+from utils.llm_gateway import get_gateway
+from utils.streaming import render_stream
+from knowledge_base.knowledge_base_management import search_local_knowledge_base, get_embeddings_for_long_text, format_search_hit
 from internet_search.duckduckgo_search import internet_search
+from utils.retrieval import retrieve_concurrently
+from utils.vis_network import render_vis_network
+from config.config import RETRIEVAL_DEADLINES, KNOWLEDGE_GRAPH_RENDERER
 import math
+import time
 
-client = ZhipuAI(api_key=openai_api_key)
+GRAPH_REFRESH_INTERVAL = 1.0  # 流式生成期间图谱最多每秒重绘一次
 
-def fetch_knowledge_from_api(notes_input, knowledge_base_result, internet_search_result):
+def fetch_knowledge_from_api(notes_input, knowledge_base_result, internet_search_result, placeholder=None, on_update=None):
     combined_input = f"{notes_input}\n\n知识库结果:\n{knowledge_base_result}\n\n互联网搜索结果:\n{internet_search_result}"
     prompt = f"根据以下内容生成结构化知识（按层级递增）:\n{combined_input}"
     messages = [
@@ -18,61 +21,77 @@ def fetch_knowledge_from_api(notes_input, knowledge_base_result, internet_search
         {'role': 'user', 'content': prompt}
     ]
 
-    response = client.chat.completions.create(
+    result = render_stream(get_gateway().stream(
         # model="glm-3-turbo",
         model="glm-4-0520",
         messages=messages,
-        stream=True,
-    )
-
-    result = ""
-    for chunk in response:
-        if hasattr(chunk.choices[0], 'delta'):
-            result += chunk.choices[0].delta.content
+        cache="fetch_knowledge_from_api",
+        cache_key=notes_input,
+    ), placeholder, on_update)
 
     add_to_chat_history('assistant', result)
     return result
 
-def format_markdown(response):
-    lines = response.split('\n')
-    formatted_lines = []
-    for line in lines:
-        line = line.strip()
-        if line:
-            formatted_lines.append(line)
-    return '\n'.join(formatted_lines)
+class KnowledgeGraphBuilder:
+    """把流式到达的 markdown 增量解析为知识图谱。
 
-def create_knowledge_graph(formatted_response, center_node):
-    graph = nx.DiGraph()
-    graph.add_node(center_node, level=0)
+    只处理已完整到达的行；节点 ID 按出现顺序分配且不再改变，
+    标题文本保存在 label 属性中，不同父节点下的同名标题是不同节点。
+    """
+
+    ROOT = "root"
+
+    def __init__(self, center_node):
+        self.graph = nx.DiGraph()
+        self.graph.add_node(self.ROOT, label=center_node, level=0)
+        self._consumed = 0
+        self._pending = ""
+        self._next_id = 1
+        self._current_subtopic = None
+        self._current_subsubtopic = None
+
+    def update(self, text):
+        """传入目前为止的完整文本，返回新增节点数。"""
+        added = self.feed(text[self._consumed:])
+        self._consumed = len(text)
+        return added
 
-    lines = formatted_response.split('\n')
-    current_subtopic = ""
-    current_subsubtopic = ""
+    def feed(self, delta):
+        self._pending += delta
+        *lines, self._pending = self._pending.split('\n')
+        return sum(self._add_line(line.strip()) for line in lines)
 
-    for line in lines:
+    def close(self):
+        added = self._add_line(self._pending.strip())
+        self._pending = ""
+        return added
+
+    def _add_node(self, label, level, parent):
+        node = f"n{self._next_id}"
+        self._next_id += 1
+        self.graph.add_node(node, label=label, level=level)
+        self.graph.add_edge(parent or self.ROOT, node)
+        return node
+
+    def _add_line(self, line):
         if line.startswith('## '):
-            current_subtopic = line.strip('# ').strip()
-            graph.add_node(current_subtopic, level=1)
-            graph.add_edge(center_node, current_subtopic)
-            current_subsubtopic = ""
+            self._current_subtopic = self._add_node(line.strip('# ').strip(), 1, self.ROOT)
+            self._current_subsubtopic = None
         elif line.startswith('### '):
-            current_subsubtopic = line.strip('# ').strip()
-            graph.add_node(current_subsubtopic, level=2)
-            graph.add_edge(current_subtopic, current_subsubtopic)
+            self._current_subsubtopic = self._add_node(line.strip('# ').strip(), 2, self._current_subtopic)
         elif line.startswith('#### '):
-            item = line.strip('# ').strip()
-            graph.add_node(item, level=3)
-            graph.add_edge(current_subsubtopic, item)
+            self._add_node(line.strip('# ').strip(), 3, self._current_subsubtopic or self._current_subtopic)
         elif line.startswith('- '):
-            item = line.strip('- ').strip()
-            graph.add_node(item, level=4)
-            if current_subsubtopic:
-                graph.add_edge(current_subsubtopic, item)
-            elif current_subtopic:
-                graph.add_edge(current_subtopic, item)
+            self._add_node(line.strip('- ').strip(), 4, self._current_subsubtopic or self._current_subtopic)
+        else:
+            return 0
+        return 1
 
-    return graph
+def create_knowledge_graph(formatted_response, center_node):
+    builder = KnowledgeGraphBuilder(center_node)
+    builder.feed(formatted_response)
+    builder.close()
+    return builder.graph
 
 def polar_layout(graph, center=(0, 0), layer_gap=5):
     pos = {}
@@ -96,6 +115,8 @@ def polar_layout(graph, center=(0, 0), layer_gap=5):
     return pos
 
 def plot_knowledge_graph(graph):
+    # plotly 只在选择 plotly 渲染方式时导入
+    import plotly.graph_objects as go
     pos = polar_layout(graph)  # 使用极坐标布局
     edge_x = []
     edge_y = []
@@ -124,7 +145,7 @@ def plot_knowledge_graph(graph):
         x, y = pos[node]
         node_x.append(x)
         node_y.append(y)
-        node_text.append(node)
+        node_text.append(graph.nodes[node]['label'])
         level = graph.nodes[node]['level']
         if level == 0:
             node_color.append('rgba(217,95,2,0.9)')  # 中心节点颜色
@@ -155,16 +176,14 @@ def plot_knowledge_graph(graph):
             color=node_color,
             colorbar=dict(
                 thickness=15,
-                title='Node Level',
-                xanchor='left',
-                titleside='right'
+                title=dict(text='Node Level', side='right'),
+                xanchor='left'
             ),
             line_width=2))
 
     fig = go.Figure(data=[edge_trace, node_trace],
                     layout=go.Layout(
-                        title='<br>Knowledge Graph',
-                        titlefont_size=20,
+                        title=dict(text='<br>Knowledge Graph', font=dict(size=20)),
                         showlegend=False,
                         hovermode='closest',
                         margin=dict(b=40, l=40, r=40, t=40),
@@ -183,26 +202,60 @@ def plot_knowledge_graph(graph):
                 )
     return fig
 
+def draw_knowledge_graph(placeholder, graph, renderer):
+    with placeholder.container():
+        if renderer == "vis-network":
+            render_vis_network(graph)
+        else:
+            # 同一次运行中会多次重绘，只在节点数变化时重绘，节点数即可作为唯一的 key
+            st.plotly_chart(plot_knowledge_graph(graph), use_container_width=True,
+                            key=f"knowledge_graph_{graph.number_of_nodes()}")
+
 def knowledge_summary_method():
     st.title("知识总结式教学方法")
     notes_input = st.text_area("请输入你想要学习的知识:")
+    renderers = ["vis-network", "plotly"]
+    renderer = st.radio("图谱渲染方式", renderers, index=renderers.index(KNOWLEDGE_GRAPH_RENDERER), horizontal=True)
     if st.button("生成知识图谱"):
-        with st.spinner("正在生成知识图谱..."):
-            with st.spinner("正在从知识库检索信息..."):
-                query_embedding = get_embeddings_for_long_text(notes_input)
-                knowledge_base_result = search_local_knowledge_base(query_embedding)
-
-            with st.spinner("正在进行联网搜索..."):
-                internet_search_result = internet_search(notes_input)
-
-            combined_knowledge_base_result = '\n'.join([f"文件名: {result[0]}, 相似度: {result[1]}" for result in knowledge_base_result])
-            response = fetch_knowledge_from_api(notes_input, combined_knowledge_base_result, internet_search_result)
-            
-            if response:
-                formatted_response = format_markdown(response)
-                graph = create_knowledge_graph(formatted_response, notes_input)
-                fig = plot_knowledge_graph(graph)
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.error("API 响应为空，请检查 API 请求。")
+        with st.spinner("正在检索知识库并联网搜索..."):
+            retrieval = retrieve_concurrently({
+                "knowledge_base": (lambda: search_local_knowledge_base(get_embeddings_for_long_text(notes_input)),
+                                   RETRIEVAL_DEADLINES["knowledge_base"]),
+                "internet": (lambda: internet_search(notes_input), RETRIEVAL_DEADLINES["internet"]),
+            })
+        for source, label in [("knowledge_base", "知识库检索"), ("internet", "联网搜索")]:
+            if retrieval[source].status == "timeout":
+                st.warning(f"{label}超时，已跳过。")
+            elif retrieval[source].status == "error":
+                st.warning(f"{label}失败，已跳过: {retrieval[source].error}")
+        knowledge_base_result = retrieval["knowledge_base"].value or []
+        internet_search_result = retrieval["internet"].value or ""
+
+        combined_knowledge_base_result = '\n\n'.join([f"{format_search_hit(hit)}\n{hit['text']}" for hit in knowledge_base_result])
+        with st.expander("知识框架", expanded=True):
+            markdown_placeholder = st.empty()
+            markdown_placeholder.markdown("正在生成知识图谱...")
+        graph_placeholder = st.empty()
+        builder = KnowledgeGraphBuilder(notes_input)
+        last_draw = [0.0, 0]  # 上次重绘的时间和当时的节点数
+
+        def draw_if_changed():
+            if builder.graph.number_of_nodes() != last_draw[1]:
+                draw_knowledge_graph(graph_placeholder, builder.graph, renderer)
+                last_draw[:] = [time.monotonic(), builder.graph.number_of_nodes()]
+
+        def update_graph(partial_response):
+            # 新节点随文本到达即加入图谱，重绘频率受 GRAPH_REFRESH_INTERVAL 限制
+            if builder.update(partial_response) and time.monotonic() - last_draw[0] >= GRAPH_REFRESH_INTERVAL:
+                draw_if_changed()
+
+        response = fetch_knowledge_from_api(notes_input, combined_knowledge_base_result, internet_search_result,
+                                            markdown_placeholder, update_graph)
+
+        if response:
+            builder.update(response)
+            builder.close()
+            draw_if_changed()
+        else:
+            st.error("API 响应为空，请检查 API 请求。")
 
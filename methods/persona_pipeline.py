@@ -0,0 +1,134 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+# 所有会话共享的工作线程；实际并发还受大模型网关的令牌桶和并发上限约束
+PERSONA_MAX_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=PERSONA_MAX_WORKERS, thread_name_prefix="persona")
+
+
+def new_card(topic: str) -> dict:
+    return {
+        "id": uuid.uuid4().hex,
+        "topic": topic,
+        "persona": None,
+        "avatar": None,  # 本地头像缓存中的图片摘要
+        "notes": "",
+        "show_input": False,
+        "status": "pending",  # pending / ready / error
+        "notes_status": None,  # None / pending / ready / error
+        "error": None
+    }
+
+
+class PersonaPipeline:
+    """单个会话的人设生成流水线。
+
+    每张卡片的人设生成完成后立即提交头像生成，多张卡片、多份笔记并行进行；
+    工作线程只在锁内原地更新卡片字典，界面重跑时读取即可看到最新进度。
+    删除卡片会取消尚未开始的任务，已在运行的任务结果被丢弃。
+    """
+
+    def __init__(self, cards: List[dict], persona_fn: Callable[[str, int], str],
+                 avatar_fn: Callable[[str], str], notes_fn: Callable[[str, str], str]):
+        self.cards = cards
+        self.persona_fn = persona_fn
+        self.avatar_fn = avatar_fn
+        self.notes_fn = notes_fn
+        self._futures = {}
+        self._cancelled = set()
+        self._lock = threading.Lock()
+
+    def _submit(self, card_id: str, fn, *args):
+        with self._lock:
+            if card_id in self._cancelled:
+                return
+            future = _executor.submit(fn, *args)
+            futures = self._futures.setdefault(card_id, set())
+            futures.add(future)
+        future.add_done_callback(lambda f: self._discard(card_id, f))
+
+    def _discard(self, card_id: str, future):
+        with self._lock:
+            futures = self._futures.get(card_id)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self._futures[card_id]
+
+    def _update(self, card: dict, **fields) -> bool:
+        with self._lock:
+            if card["id"] in self._cancelled:
+                return False
+            card.update(fields)
+            return True
+
+    def _run_persona(self, card: dict, variant: int):
+        try:
+            persona = self.persona_fn(card["topic"], variant)
+        except Exception as e:
+            self._update(card, status="error", error=f"生成人设时出错: {e}")
+            return
+        if self._update(card, persona=persona):
+            # 人设一到就开始生成头像，不等同批的其他人设
+            self._submit(card["id"], self._run_avatar, card)
+
+    def _run_avatar(self, card: dict):
+        try:
+            avatar = self.avatar_fn(card["persona"])
+        except Exception as e:
+            self._update(card, status="error", error=f"生成头像时出错: {e}")
+            return
+        self._update(card, avatar=avatar, status="ready")
+
+    def _run_notes(self, card: dict, topic: str):
+        try:
+            notes = self.notes_fn(card["persona"], topic)
+        except Exception as e:
+            self._update(card, notes_status="error", error=f"生成笔记时出错: {e}")
+            return
+        self._update(card, notes=notes, notes_status="ready")
+
+    def add_personas(self, topic: str, count: int, first_variant: int = 0) -> List[dict]:
+        """为同一主题并发生成 count 个人设，第 i 个使用缓存变体 first_variant + i。"""
+        cards = [new_card(topic) for _ in range(count)]
+        with self._lock:
+            self.cards.extend(cards)
+        for i, card in enumerate(cards):
+            self._submit(card["id"], self._run_persona, card, first_variant + i)
+        return cards
+
+    def request_notes(self, card_id: str, topic: str):
+        card = self.get(card_id)
+        if card is None or not card["persona"] or card["notes_status"] == "pending":
+            return
+        self._update(card, notes_status="pending", error=None)
+        self._submit(card_id, self._run_notes, card, topic)
+
+    def set_fields(self, card_id: str, **fields):
+        card = self.get(card_id)
+        if card is not None:
+            self._update(card, **fields)
+
+    def get(self, card_id: str) -> Optional[dict]:
+        with self._lock:
+            return next((card for card in self.cards if card["id"] == card_id), None)
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            return [dict(card) for card in self.cards]
+
+    def delete(self, card_id: str):
+        with self._lock:
+            self._cancelled.add(card_id)
+            futures = self._futures.pop(card_id, ())
+            self.cards[:] = [card for card in self.cards if card["id"] != card_id]
+        # cancel 会同步触发完成回调，回调需要获取锁，因此放在锁外
+        for future in futures:
+            future.cancel()
+
+    def busy(self) -> bool:
+        with self._lock:
+            return bool(self._futures)
@@ -0,0 +1,128 @@
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import Callable, Iterable, List, Optional
+
+
+def question_text(question: dict) -> str:
+    return "\n".join([question["question"], *question["options"]])
+
+
+class QuestionBank:
+    """持久化的练习题库，每道题连同主题向量和题目向量一起存入 SQLite。
+
+    - find_unseen: 按主题向量检索当前用户没做过的题，命中时无需调用大模型；
+    - add: 新题与库中已有题目（及同批题目）的余弦相似度不低于 duplicate_threshold 时视为重复并丢弃。
+
+    向量矩阵常驻内存，检索只做一次矩阵乘法。embed_fn 接收文本列表，返回向量列表。
+    """
+
+    def __init__(self, path: str, embed_fn: Callable[[List[str]], List[List[float]]],
+                 topic_threshold: float = 0.85, duplicate_threshold: float = 0.92):
+        self.embed_fn = embed_fn
+        self.topic_threshold = topic_threshold
+        self.duplicate_threshold = duplicate_threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL, question TEXT NOT NULL, "
+            "topic_embedding BLOB NOT NULL, embedding BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        rows = self._conn.execute(
+            "SELECT id, question, topic_embedding, embedding FROM questions ORDER BY id"
+        ).fetchall()
+        self._ids = [row[0] for row in rows]
+        self._questions = [json.loads(row[1]) for row in rows]
+        self._topic_matrix = self._stack([row[2] for row in rows])
+        self._matrix = self._stack([row[3] for row in rows])
+
+    @staticmethod
+    def _stack(blobs: List[bytes]) -> Optional[np.ndarray]:
+        if not blobs:
+            return None
+        return np.vstack([np.frombuffer(blob, dtype='float32') for blob in blobs])
+
+    def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        try:
+            vectors = np.asarray(self.embed_fn(texts), dtype='float32').reshape(len(texts), -1)
+        except Exception:
+            # 嵌入失败时题库只是不参与检索和去重，不影响出题
+            return None
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def _rank(self, topic_vector: np.ndarray, exclude_ids: Iterable[int]) -> List[int]:
+        if self._topic_matrix is None:
+            return []
+        exclude_ids = set(exclude_ids)
+        similarities = self._topic_matrix @ topic_vector
+        return [
+            int(i) for i in np.argsort(-similarities)
+            if similarities[i] >= self.topic_threshold and self._ids[i] not in exclude_ids
+        ]
+
+    def find_unseen(self, topic: str, exclude_ids: Iterable[int] = ()) -> Optional[dict]:
+        """返回与主题最相关且不在 exclude_ids 中的题目，没有时返回 None。"""
+        vectors = self._embed([topic])
+        if vectors is None:
+            return None
+        with self._lock:
+            ranked = self._rank(vectors[0], exclude_ids)
+            if not ranked:
+                return None
+            return {**self._questions[ranked[0]], "id": self._ids[ranked[0]]}
+
+    def count_unseen(self, topic: str, exclude_ids: Iterable[int] = ()) -> int:
+        vectors = self._embed([topic])
+        if vectors is None:
+            return 0
+        with self._lock:
+            return len(self._rank(vectors[0], exclude_ids))
+
+    def add(self, topic: str, questions: List[dict]) -> List[dict]:
+        """去重后入库，返回被接受的题目（带 id）；嵌入失败时原样返回且不入库。"""
+        if not questions:
+            return []
+        vectors = self._embed([topic] + [question_text(question) for question in questions])
+        if vectors is None:
+            return questions
+        topic_vector, question_vectors = vectors[0], vectors[1:]
+
+        accepted = []
+        with self._lock:
+            kept_vectors = []
+            for question, vector in zip(questions, question_vectors):
+                existing = [self._matrix] if self._matrix is not None else []
+                candidates = existing + ([np.vstack(kept_vectors)] if kept_vectors else [])
+                if any((matrix @ vector).max() >= self.duplicate_threshold for matrix in candidates):
+                    continue
+                cursor = self._conn.execute(
+                    "INSERT INTO questions (topic, question, topic_embedding, embedding, created) VALUES (?, ?, ?, ?, ?)",
+                    (topic, json.dumps(question, ensure_ascii=False), topic_vector.tobytes(), vector.tobytes(), time.time())
+                )
+                kept_vectors.append(vector)
+                self._ids.append(cursor.lastrowid)
+                self._questions.append(question)
+                accepted.append({**question, "id": cursor.lastrowid})
+            self._conn.commit()
+
+            if kept_vectors:
+                new_rows = np.vstack(kept_vectors)
+                new_topics = np.repeat(topic_vector[None, :], len(kept_vectors), axis=0)
+                self._matrix = new_rows if self._matrix is None else np.vstack([self._matrix, new_rows])
+                self._topic_matrix = new_topics if self._topic_matrix is None else np.vstack([self._topic_matrix, new_topics])
+        return accepted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ids)
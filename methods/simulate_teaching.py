@@ -1,36 +1,35 @@
 import json
+import time
 import streamlit as st
-from zhipuai import ZhipuAI
-from config.config import openai_api_key
-from utils.chat_helpers import add_to_chat_history, build_prompt, clean_api_response, generate_image_url, generate_content
+from utils.context_manager import add_to_chat_history, current_session_id, set_content_topic
+from utils.chat_helpers import build_prompt, clean_api_response, generate_avatar, avatar_data_uri, generate_content
 from utils.css_styles import persona_card_styles
+from utils.llm_gateway import get_gateway
+from methods.persona_pipeline import PersonaPipeline
+from utils.session_persistence import restore_session_state, persist_session_state
 
-client = ZhipuAI(api_key=openai_api_key)
+PERSONA_BATCH_MAX = 6  # 一次最多并发生成的人设数
+PERSONA_POLL_INTERVAL = 0.5  # 有后台任务时界面的刷新间隔（秒）
 
-def generate_persona(user_input):
+def generate_persona(user_input, variant=0, session_id=None):
     prompt = build_prompt(user_input)
-    response = client.chat.completions.create(
+    # variant 区分同一主题下的第几个人设，热门主题的前几个人设可在用户之间复用
+    response = get_gateway().complete(
         # model="glm-3-turbo",
         model="glm-4-0520",
-        messages=[{'role': 'user', 'content': prompt}]
+        messages=[{'role': 'user', 'content': prompt}],
+        cache="generate_persona",
+        cache_variant=variant
     )
 
-    result = ""
-    try:
-        if hasattr(response, 'choices'):
-            for choice in response.choices:
-                if hasattr(choice, 'message'):
-                    cleaned_content = clean_api_response(choice.message.content)
-                    result += cleaned_content
-    except Exception as e:
-        st.error(f"Error processing response: {e}")
-
-    add_to_chat_history('assistant', result)
+    # 在后台线程中运行，出错时直接抛出，由流水线记入卡片并在界面重跑时显示
+    result = clean_api_response(response)
+    add_to_chat_history('assistant', result, session_id)
     return result
 
 def generate_notes(persona, topic):
     prompt = f"基于以下人设生成关于'{topic}'的笔记：{persona}"
-    response = client.chat.completions.create(
+    response = get_gateway().create(
         # model="glm-3-turbo",
         model="glm-4-0520",
         messages=[{'role': 'user', 'content': prompt}]
@@ -48,53 +47,71 @@ def generate_notes(persona, topic):
 
     return result
 
-def sync_session_state():
+def resume_cards(cards):
+    """恢复的卡片没有对应的后台任务，未完成的部分标记为中断。"""
+    resumed = []
+    for card in cards:
+        if card["persona"] is None:
+            continue
+        if card["status"] == "pending":
+            card.update(status="error", error="头像生成被中断，可删除后重新生成")
+        if card["notes_status"] == "pending":
+            card.update(notes_status=None)
+        resumed.append(card)
+    return resumed
+
+def get_pipeline():
+    restore_session_state(["personas", "persona_topic_counts"])
     if 'personas' not in st.session_state:
         st.session_state.personas = []
-    if 'show_input' not in st.session_state:
-        st.session_state.show_input = []
-    if 'notes' not in st.session_state:
-        st.session_state.notes = []
-
-    # Ensure lengths are the same
-    while len(st.session_state.show_input) < len(st.session_state.personas):
-        st.session_state.show_input.append(False)
-    while len(st.session_state.notes) < len(st.session_state.personas):
-        st.session_state.notes.append("")
-
-    # In case the lists are longer than personas (which shouldn't happen but just in case)
-    while len(st.session_state.show_input) > len(st.session_state.personas):
-        st.session_state.show_input.pop()
-    while len(st.session_state.notes) > len(st.session_state.personas):
-        st.session_state.notes.pop()
+    if 'persona_pipeline' not in st.session_state:
+        st.session_state.personas = resume_cards(st.session_state.personas)
+        # 人设在后台线程生成，显式带上会话 ID 以写入本会话的聊天记录
+        session_id = current_session_id()
+        st.session_state.persona_pipeline = PersonaPipeline(
+            st.session_state.personas,
+            lambda topic, variant: generate_persona(topic, variant, session_id),
+            generate_avatar,
+            generate_content
+        )
+    return st.session_state.persona_pipeline
 
 def simulate_teaching_method():
     st.title("模拟教学方法")
 
-    global content_topic
+    pipeline = get_pipeline()
 
     st.markdown("<div style='background-color: #fafafa; padding: 10px; border-radius: 10px;'>", unsafe_allow_html=True)
     st.write("请输入内容主题：")
     content_topic_input = st.text_input("内容主题", key="content_topic_input")
+    persona_count = st.number_input("人设数量", min_value=1, max_value=PERSONA_BATCH_MAX, value=1, step=1)
 
     if st.button("生成人设"):
-        content_topic = content_topic_input
-        with st.spinner("正在生成人设..."):
-            persona = generate_persona(content_topic_input)
-            image_url = generate_image_url(persona)
-            if 'personas' not in st.session_state:
-                st.session_state.personas = []
-            st.session_state.personas.append((persona, image_url))
-            sync_session_state()
-
-    if 'personas' in st.session_state:
+        set_content_topic(content_topic_input)
+        topic_counts = st.session_state.setdefault("persona_topic_counts", {})
+        variant = topic_counts.get(content_topic_input, 0)
+        topic_counts[content_topic_input] = variant + persona_count
+        pipeline.add_personas(content_topic_input, int(persona_count), variant)
+
+    cards = pipeline.snapshot()
+    if cards:
         st.markdown(persona_card_styles, unsafe_allow_html=True)
         st.markdown("<div class='persona-container'>", unsafe_allow_html=True)
-        for idx, (persona, image_url) in enumerate(st.session_state.personas):
-            create_persona_card(persona, image_url, idx)
+        for card in cards:
+            create_persona_card(pipeline, card)
         st.markdown("</div>", unsafe_allow_html=True)
 
-def create_persona_card(description, image_url, idx):
+    persist_session_state({
+        "personas": cards,
+        "persona_topic_counts": st.session_state.get("persona_topic_counts", {})
+    })
+
+    if pipeline.busy():
+        # 后台任务未完成时定时重跑，卡片随任务完成逐个填充
+        time.sleep(PERSONA_POLL_INTERVAL)
+        st.rerun()
+
+def create_persona_card(pipeline, card):
     def build_html_content(data):
         def generate_list(data):
             if isinstance(data, dict):
@@ -115,18 +132,26 @@ def create_persona_card(description, image_url, idx):
 
         return generate_list(data)
 
-    try:
-        persona_data = json.loads(description)
-    except json.JSONDecodeError:
-        persona_data = {"description": description}
-
-    card_html_content = build_html_content(persona_data)
+    idx = card["id"]
+    description = card["persona"]
+    if description is None:
+        card_html_content = "<p>正在生成人设...</p>" if card["status"] == "pending" else ""
+    else:
+        try:
+            persona_data = json.loads(description)
+        except json.JSONDecodeError:
+            persona_data = {"description": description}
+        card_html_content = build_html_content(persona_data)
+
+    # 缩略图从本地缓存读取后内嵌，不依赖会过期的远程链接
+    avatar_src = avatar_data_uri(card["avatar"])
+    avatar_html = f'<img src="{avatar_src}" class="persona-avatar" alt="Avatar">' if avatar_src else ""
 
     st.markdown(
         f"""
         <div class="persona-card">
             <h5>人设卡片</h5>
-            <img src="{image_url}" class="persona-avatar" alt="Avatar">
+            {avatar_html}
             <div style="height: 300px; overflow: hidden; text-overflow: ellipsis;">
                 {card_html_content}
             </div>
@@ -135,26 +160,27 @@ def create_persona_card(description, image_url, idx):
         unsafe_allow_html=True
     )
 
-    if st.button("生成笔记", key=f"show_input_{idx}"):
-        st.session_state.show_input[idx] = not st.session_state.show_input[idx]
-        st.experimental_rerun()
+    if card["error"]:
+        st.error(card["error"])
+
+    if description is not None and st.button("生成笔记", key=f"show_input_{idx}"):
+        card["show_input"] = not card["show_input"]
+        pipeline.set_fields(idx, show_input=card["show_input"])
 
-    if st.session_state.show_input[idx]:
+    if card["show_input"]:
         note_topic = st.text_input("请输入主题词", key=f"note_topic_{idx}")
         if st.button("开始生成", key=f"generate_{idx}"):
-            with st.spinner("正在生成笔记..."):
-                notes = generate_content(description, note_topic)
-                st.session_state.notes[idx] = notes
-                st.experimental_rerun()
+            pipeline.request_notes(idx, note_topic)
+            card["notes_status"] = "pending"
 
-    if st.session_state.notes[idx]:
-        st.write(st.session_state.notes[idx])
+    if card["notes_status"] == "pending":
+        st.info("正在生成笔记...")
+    elif card["notes"]:
+        st.write(card["notes"])
 
     if st.button("✕", key=f"delete_{idx}"):
-        delete_persona(idx)
+        delete_persona(pipeline, idx)
 
-def delete_persona(idx):
-    if 'personas' in st.session_state:
-        st.session_state.personas.pop(idx)
-    sync_session_state()
-    st.experimental_rerun()
+def delete_persona(pipeline, idx):
+    pipeline.delete(idx)
+    st.rerun()
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from knowledge_base.ann_index import build_index, search_excluding
+
+DIM = 16
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return np.random.default_rng(0).standard_normal((2000, DIM)).astype('float32')
+
+
+@pytest.mark.parametrize("index_type, params", [
+    ("flat", {}),
+    ("ivf_flat", {"nlist": 16, "nprobe": 16}),
+    ("hnsw", {}),
+])
+def test_excluded_ids_are_skipped_and_k_results_returned(vectors, index_type, params):
+    index = build_index(vectors, DIM, index_type, **params)
+    excluded = np.arange(0, len(vectors), 2)
+    distances, indices = search_excluding(index, vectors[:4], 5, excluded)
+    assert (indices >= 0).all() and (indices % 2 == 1).all()
+    # 与只在保留向量上精确检索的结果一致；IVF 沿用索引的 nprobe，扫描全部簇时同样精确
+    exact = build_index(vectors[1::2], DIM, "flat")
+    _, expected = exact.search(vectors[:4], 5)
+    assert indices.tolist() == (expected * 2 + 1).tolist()
+
+
+def test_without_exclusions_searches_normally(vectors):
+    index = build_index(vectors, DIM, "flat")
+    _, indices = search_excluding(index, vectors[:1], 3, np.empty(0, dtype='int64'))
+    assert indices[0][0] == 0
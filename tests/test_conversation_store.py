@@ -0,0 +1,26 @@
+from config.config import HISTORY_TOKEN_BUDGET, MAX_HISTORY_LENGTH
+from utils.conversation_store import Conversation, ConversationStore, estimate_tokens
+
+
+def test_short_messages_are_kept_up_to_the_token_budget():
+    conversation = Conversation(token_budget=200, max_messages=500)
+    for i in range(40):
+        conversation.append('user', f"第{i}条")
+    assert len(conversation) == 40
+    assert conversation.tokens <= 200
+
+
+def test_oldest_messages_are_dropped_over_budget_and_latest_is_kept():
+    conversation = Conversation(token_budget=10, max_messages=500)
+    conversation.append('user', "一二三四五六")
+    conversation.append('assistant', "七八九十")
+    conversation.append('user', "甲乙丙丁戊己庚辛壬癸子丑")
+    assert conversation.messages() == [{'role': 'user', 'content': "甲乙丙丁戊己庚辛壬癸子丑"}]
+    assert conversation.tokens == estimate_tokens("甲乙丙丁戊己庚辛壬癸子丑")
+
+
+def test_configured_history_is_limited_by_tokens_not_count():
+    conversation = ConversationStore(HISTORY_TOKEN_BUDGET, MAX_HISTORY_LENGTH).get("session")
+    for i in range(20):
+        conversation.append('user', f"问题 {i}")
+    assert len(conversation) == 20
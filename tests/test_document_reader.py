@@ -0,0 +1,27 @@
+import io
+import pytest
+from knowledge_base.document_reader import detect_encoding, iter_text_blocks, ENCODING_SAMPLE_SIZE
+
+
+def read_all(data: bytes) -> str:
+    return "".join(text for _, text in iter_text_blocks(io.BytesIO(data)))
+
+
+@pytest.mark.parametrize("encoding", ["gb18030", "utf-8"])
+def test_ascii_prefix_longer_than_sample_keeps_later_text(encoding):
+    text = "a" * (ENCODING_SAMPLE_SIZE + 4464) + "中文内容测试"
+    assert read_all(text.encode(encoding)) == text
+
+
+def test_non_ascii_after_first_read_block():
+    text = "a" * 3_000_000 + "这是一段中文内容。\n" * 20
+    assert read_all(text.encode("gb18030")) == text
+
+
+def test_ascii_sample_is_undecided_until_complete():
+    assert detect_encoding(b"abc") == "ascii"
+    assert detect_encoding(b"abc", complete=True) == "utf-8"
+
+
+def test_bom_wins():
+    assert read_all("中文".encode("utf-16")) == "中文"
@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+import numpy as np
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.fake_services import fake_embedding
+from knowledge_base.embedding_cache import EmbeddingCache
+from knowledge_base.embedding_client import EmbeddingClient
+
+DIM = 8
+
+
+class EmbeddingServer:
+    """本地 /v4/embeddings 替身：先按 failures 依次返回错误状态，之后倒序返回带 index 的结果。"""
+
+    def __init__(self, failures=(), drop=0):
+        self.failures = list(failures)
+        self.drop = drop
+        self.calls = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.calls += 1
+                    failure = server.failures.pop(0) if server.failures else None
+                if failure:
+                    status, retry_after = failure
+                    self.send_response(status)
+                    self.send_header("Retry-After", str(retry_after))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                data = [{"index": i, "embedding": fake_embedding(text, DIM)} for i, text in enumerate(payload["input"])]
+                data = data[server.drop:][::-1]
+                body = json.dumps({"data": data}).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        host, port = self._server.server_address[:2]
+        self.url = f"http://{host}:{port}/api/paas/v4/embeddings"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def make(**kwargs):
+        servers.append(EmbeddingServer(**kwargs))
+        return servers[-1]
+
+    yield make
+    for server in servers:
+        server.close()
+
+
+def make_client(server, **kwargs):
+    kwargs.setdefault("backoff_factor", 0.01)
+    return EmbeddingClient(server.url, "test", "embedding-2", **kwargs)
+
+
+def test_results_follow_index_across_batches(make_server):
+    server = make_server()
+    texts = [f"文本 {i}" for i in range(7)]
+    embeddings = make_client(server, batch_size=2).embed(texts)
+    np.testing.assert_allclose(embeddings, [fake_embedding(text, DIM) for text in texts], rtol=1e-6)
+    assert server.calls == 4
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retries_after_retry_after(make_server, status):
+    server = make_server(failures=[(status, 1)])
+    start = time.monotonic()
+    embeddings = make_client(server).embed(["a", "b"])
+    assert time.monotonic() - start >= 0.9
+    assert server.calls == 2
+    np.testing.assert_allclose(embeddings, [fake_embedding("a", DIM), fake_embedding("b", DIM)], rtol=1e-6)
+
+
+def test_gives_up_after_max_retries(make_server):
+    server = make_server(failures=[(503, 0)] * 3)
+    with pytest.raises(requests.HTTPError):
+        make_client(server, max_retries=2).embed(["a"])
+    assert server.calls == 3
+
+
+def test_result_count_mismatch_raises(make_server):
+    server = make_server(drop=1)
+    with pytest.raises(ValueError, match="返回 2 条结果，请求了 3 条"):
+        make_client(server).embed(["a", "b", "c"])
+
+
+def test_cached_texts_make_no_requests(make_server, tmp_path):
+    server = make_server()
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    client = make_client(server, cache=cache)
+    first = client.embed(["a", "b", "a"])
+    assert server.calls == 1
+    np.testing.assert_allclose(client.embed(["b", "a"]), [first[1], first[0]], rtol=1e-6)
+    assert server.calls == 1
+    assert cache.hits == 2
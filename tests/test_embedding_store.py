@@ -0,0 +1,111 @@
+import json
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from knowledge_base import embedding_store
+from knowledge_base.embedding_store import (load_embedding_store, upsert_embedding_store, migrate_embeddings_txt,
+                                            read_passage, source_path, staged_source_path)
+
+DIM = 4
+
+
+def chunk_records(name, doc_id, count, page=1):
+    return [{"doc_id": doc_id, "name": name, "content_hash": doc_id, "page": page,
+             "start": i, "end": i + 2, "offset": i, "length": 2} for i in range(count)]
+
+
+def write_source(store_dir, doc_id, text="abcdefghij"):
+    os.makedirs(os.path.dirname(source_path(store_dir, doc_id)), exist_ok=True)
+    with open(source_path(store_dir, doc_id), 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def test_meta_stores_documents_not_chunks(tmp_path):
+    store_dir = str(tmp_path)
+    write_source(store_dir, "a")
+    upsert_embedding_store(store_dir, chunk_records("a.txt", "a", 1000), np.ones((1000, DIM)), DIM)
+    with open(os.path.join(store_dir, "meta.json"), encoding='utf-8') as f:
+        meta = json.load(f)
+    assert meta["documents"] == [{"name": "a.txt", "doc_id": "a", "content_hash": "a"}]
+    records, vectors = load_embedding_store(store_dir)
+    assert len(records) == len(vectors) == 1000
+    assert records[3] == chunk_records("a.txt", "a", 4)[3]
+    assert read_passage(store_dir, records[3]) == "de"
+
+
+def test_replacing_a_document_marks_rows_deleted_then_compacts(tmp_path):
+    store_dir = str(tmp_path)
+    for doc_id in ("a", "b1"):
+        write_source(store_dir, doc_id)
+    upsert_embedding_store(store_dir, chunk_records("a.txt", "a", 10), np.zeros((10, DIM)), DIM)
+    upsert_embedding_store(store_dir, chunk_records("b.txt", "b1", 2, page=None), np.ones((2, DIM)), DIM)
+    write_source(store_dir, "b2")
+    upsert_embedding_store(store_dir, chunk_records("b.txt", "b2", 3), np.full((3, DIM), 2), DIM)
+
+    records, vectors = load_embedding_store(store_dir)
+    assert len(records) == 15
+    assert records.deleted.tolist() == [False] * 10 + [True] * 2 + [False] * 3
+    assert records[10]["page"] is None and records[10]["deleted"]
+
+    write_source(store_dir, "a2")
+    upsert_embedding_store(store_dir, chunk_records("a.txt", "a2", 1), np.full((1, DIM), 3), DIM)
+    records, vectors = load_embedding_store(store_dir)
+    assert records.deleted_count == 0
+    assert [record["doc_id"] for record in records] == ["b2"] * 3 + ["a2"]
+    assert vectors[:, 0].tolist() == [2, 2, 2, 3]
+    assert sorted(os.listdir(os.path.join(store_dir, "sources"))) == ["a2.txt", "b2.txt"]
+
+
+def test_legacy_store_is_upgraded_on_load(tmp_path):
+    store_dir = str(tmp_path)
+    vectors = np.arange(3 * DIM, dtype='float32').reshape(3, DIM)
+    vectors.tofile(os.path.join(store_dir, "vectors-000001.bin"))
+    legacy_records = [{"name": "x", "deleted": True}, {"name": "x"}, {"name": "y", "page": 2}]
+    with open(os.path.join(store_dir, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump({"format": embedding_store.STORE_FORMAT, "version": 1, "generation": 1, "dim": DIM,
+                   "dtype": "float32", "vector_file": "vectors-000001.bin", "count": 3, "records": legacy_records}, f)
+
+    records, loaded = load_embedding_store(store_dir)
+    assert list(records) == [{"name": "x", "page": None, "deleted": True}, {"name": "x", "page": None},
+                             {"name": "y", "page": 2}]
+    np.testing.assert_array_equal(loaded, vectors)
+    assert embedding_store.read_store_meta(store_dir)["version"] == embedding_store.STORE_VERSION
+
+
+def test_concurrent_migrations_convert_embeddings_txt_once(tmp_path):
+    txt_path = str(tmp_path / "embeddings.txt")
+    store_dir = str(tmp_path / "store")
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        for i in range(3):
+            f.write(f"doc{i}\t{json.dumps([float(i)] * DIM)}\n")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        metas = list(pool.map(lambda _: migrate_embeddings_txt(txt_path, store_dir, DIM), range(8)))
+    assert {meta["generation"] for meta in metas} == {1}
+    records, vectors = load_embedding_store(store_dir)
+    assert [record["name"] for record in records] == ["doc0", "doc1", "doc2"]
+    assert vectors[:, 0].tolist() == [0, 1, 2]
+
+    # 已有向量库时不会被旧文本文件覆盖
+    write_source(store_dir, "a")
+    upsert_embedding_store(store_dir, chunk_records("a.txt", "a", 1), np.full((1, DIM), 9), DIM)
+    migrate_embeddings_txt(txt_path, store_dir, DIM)
+    records, _ = load_embedding_store(store_dir)
+    assert len(records) == 4
+
+
+def test_compaction_keeps_sources_staged_but_not_yet_committed(tmp_path):
+    store_dir = str(tmp_path)
+    write_source(store_dir, "a1")
+    upsert_embedding_store(store_dir, chunk_records("a.txt", "a1", 2), np.zeros((2, DIM)), DIM)
+    # b 的原文已写好，但记录还没提交
+    with open(staged_source_path(store_dir, "b"), 'w', encoding='utf-8') as f:
+        f.write("abcdefghij")
+    write_source(store_dir, "a2")
+    upsert_embedding_store(store_dir, chunk_records("a.txt", "a2", 1), np.ones((1, DIM)), DIM)
+    assert load_embedding_store(store_dir)[0].deleted_count == 0
+
+    upsert_embedding_store(store_dir, chunk_records("b.txt", "b", 2), np.ones((2, DIM)), DIM)
+    records, _ = load_embedding_store(store_dir)
+    assert read_passage(store_dir, records[1]) == "ab"
+    assert not os.path.exists(staged_source_path(store_dir, "b"))
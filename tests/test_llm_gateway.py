@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+from zhipuai import APIAuthenticationError, APIInternalError, APIRequestFailedError
+
+from benchmarks.fake_services import FakeServices, make_outline
+from utils.llm_gateway import LLMGateway, TokenBucket
+
+MESSAGES = [{'role': 'user', 'content': "牛顿第一定律"}]
+EXPECTED = make_outline("牛顿第一定律")
+
+
+def _gateway(services, **kwargs):
+    options = {"rate": 1000, "burst": 1000, "backoff": 0.01, "max_backoff": 1.0, **kwargs}
+    return LLMGateway("bench.secret", base_url=services.base_url, timeout=10, **options)
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    # 记录每次退避的上限，并让退避不实际等待
+    bounds = []
+    def uniform(low, high):
+        bounds.append(high)
+        return 0.0
+    monkeypatch.setattr("utils.llm_gateway.random.uniform", uniform)
+    return bounds
+
+
+@pytest.mark.parametrize("statuses", [[429, 500], [503, 503]])
+def test_retryable_errors_are_retried_with_exponential_backoff(statuses, backoffs):
+    with FakeServices(fail_statuses=statuses) as services:
+        result = _gateway(services, backoff=0.5, max_backoff=0.8).complete("glm-4", MESSAGES)
+    assert result == EXPECTED
+    assert services.requests["chat"] == 3
+    assert backoffs == [0.5, 0.8]
+
+
+def test_retries_give_up_after_max_retries(backoffs):
+    with FakeServices(fail_statuses=[500] * 5) as services:
+        with pytest.raises(APIInternalError):
+            _gateway(services, max_retries=2).complete("glm-4", MESSAGES)
+    assert services.requests["chat"] == 3
+    assert len(backoffs) == 2
+
+
+@pytest.mark.parametrize("status, error", [(400, APIRequestFailedError), (401, APIAuthenticationError)])
+def test_client_errors_are_not_retried(status, error, backoffs):
+    with FakeServices(fail_statuses=[status]) as services:
+        with pytest.raises(error):
+            _gateway(services).complete("glm-4", MESSAGES)
+    assert services.requests["chat"] == 1
+    assert backoffs == []
+
+
+def test_token_bucket_allows_burst_then_throttles_to_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    bucket.acquire()
+    bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    for _ in range(4):
+        bucket.acquire()
+    # 突发额度用完后，4 个请求至少需要 4 / 20 秒
+    assert time.monotonic() - start >= 0.19
+
+
+def test_gateway_calls_are_throttled_by_the_bucket():
+    with FakeServices() as services:
+        gateway = _gateway(services, rate=10, burst=1)
+        start = time.monotonic()
+        for _ in range(3):
+            gateway.complete("glm-4", MESSAGES)
+    assert time.monotonic() - start >= 0.19
+    assert services.requests["chat"] == 3
+
+
+def test_stream_assembles_the_full_response(backoffs):
+    with FakeServices(chunk_chars=7, fail_statuses=[429]) as services:
+        deltas = list(_gateway(services).stream("glm-4", MESSAGES))
+    assert len(deltas) > 1
+    assert "".join(deltas) == EXPECTED
+    # 建立流之前的 429 会被重试
+    assert services.requests["chat"] == 2
+
+
+def test_acomplete_runs_requests_concurrently():
+    with FakeServices(chat_latency=0.2) as services:
+        gateway = _gateway(services)
+        async def run():
+            return await asyncio.gather(*(gateway.acomplete("glm-4", MESSAGES) for _ in range(4)))
+        start = time.monotonic()
+        results = asyncio.run(run())
+    assert results == [EXPECTED] * 4
+    assert time.monotonic() - start < 0.6
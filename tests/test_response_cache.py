@@ -0,0 +1,34 @@
+import pytest
+
+from utils.response_cache import ResponseCache
+
+
+def _embed(text):
+    # 只看文本开头的关键词，足以区分测试里的几个查询
+    return [1.0, 0.0] if text.startswith("牛顿") else [0.0, 1.0]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "cache.sqlite3"), embed_fn=_embed)
+
+
+def _prompt(notes, retrieved):
+    return [{'role': 'user', 'content': f"根据以下内容生成结构化知识:\n{notes}\n\n检索结果:\n{retrieved}"}]
+
+
+def test_semantic_key_matches_on_user_input_not_assembled_prompt(cache):
+    cache.put("kb", "glm", _prompt("牛顿第一定律", "结果A"), {}, "回复", semantic=True, semantic_key="牛顿第一定律")
+    # 检索结果不同、提示词不同，但用户输入语义一致时命中
+    assert cache.get("kb", "glm", _prompt("牛顿第一定律 惯性", "结果B"), {}, semantic=True,
+                     semantic_key="牛顿第一定律 惯性") == "回复"
+    # 提示词开头相同但用户输入不同时不命中
+    assert cache.get("kb", "glm", _prompt("光合作用", "结果A"), {}, semantic=True, semantic_key="光合作用") is None
+    assert cache.stats()["kb"]["semantic_hits"] == 1
+
+
+def test_exact_match_still_uses_full_prompt(cache):
+    messages = _prompt("牛顿第一定律", "结果A")
+    cache.put("kb", "glm", messages, {}, "回复", semantic=True, semantic_key="牛顿第一定律")
+    assert cache.get("kb", "glm", messages, {}) == "回复"
+    assert cache.get("kb", "glm", _prompt("牛顿第一定律", "结果B"), {}) is None
@@ -0,0 +1,77 @@
+import threading
+import time
+from benchmarks.fake_services import FakeSearchBackend
+from internet_search.search_service import SearchService
+
+
+class CountingBackend(FakeSearchBackend):
+    """记录调用次数；设置 gate 时每次查询都等到 gate 打开才返回。"""
+
+    def __init__(self, gate=None, fail=False, **kwargs):
+        super().__init__(**kwargs)
+        self.gate = gate
+        self.fail = fail
+        self.calls = []
+
+    def text(self, query, max_results=5):
+        self.calls.append(query)
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError("search failed")
+        return super().text(query, max_results)
+
+
+def make_service(backend, **kwargs):
+    return SearchService(lambda: backend, **kwargs)
+
+
+def test_results_are_cached_per_normalized_query_until_ttl():
+    backend = CountingBackend()
+    service = make_service(backend, ttl=0.2)
+    first = service.search("Python  教程")
+    assert service.search(" python 教程 ") == first
+    assert len(backend.calls) == 1
+    time.sleep(0.3)
+    service.search("python 教程")
+    assert len(backend.calls) == 2
+
+
+def test_search_many_merges_by_url():
+    backend = CountingBackend(results=3)
+    service = make_service(backend)
+    results = service.search_many(["a", "A", "b", "a"])
+    expected = FakeSearchBackend(results=3)
+    assert [result["href"] for result in results] == [
+        result["href"] for result in expected.text("a") + expected.text("b")]
+    # 规范化后相同的查询只请求一次
+    assert sorted(backend.calls) == ["a", "b"]
+
+
+def test_deadline_returns_partial_results_and_caches_late_ones():
+    gate = threading.Event()
+    slow = CountingBackend(gate=gate)
+    service = make_service(slow, deadline=0.1, max_workers=2)
+    start = time.monotonic()
+    assert service.search("slow") == []
+    assert time.monotonic() - start < 1
+    # 同一查询仍在进行，不会再次提交
+    assert service.search("slow") == []
+    assert slow.calls == ["slow"]
+
+    gate.set()
+    for _ in range(50):
+        if service.search("slow", deadline=0):
+            break
+        time.sleep(0.02)
+    assert len(service.search("slow")) == 5
+    assert slow.calls == ["slow"]
+
+
+def test_errors_are_not_cached():
+    backend = CountingBackend(fail=True)
+    service = make_service(backend)
+    assert service.search("q") == []
+    backend.fail = False
+    assert len(service.search("q")) == 5
+    assert backend.calls == ["q", "q"]
@@ -1,22 +1,17 @@
 import streamlit as st
 import re
-from zhipuai import ZhipuAI
-from config.config import openai_api_key, MAX_HISTORY_LENGTH
+import base64
+from config.config import AVATAR_CACHE_DIR, AVATAR_CACHE_MAX_BYTES, AVATAR_THUMBNAIL_SIZE
+from utils.llm_gateway import get_gateway
+from utils.image_cache import ImageCache
+from utils.context_manager import get_chat_history
+from utils.resources import get_resource
 
-chat_history = []  # 用于存储聊天记录
-content_topic = ""  # 用于存储用户输入的内容主题
-
-client = ZhipuAI(api_key=openai_api_key)
-
-def add_to_chat_history(role, content):
-    global chat_history
-    if len(chat_history) >= MAX_HISTORY_LENGTH:
-        chat_history.pop(0)  # 移除最早的记录
-    chat_history.append({'role': role, 'content': content})
+def get_avatar_cache():
+    return get_resource("avatar_cache", lambda: ImageCache(AVATAR_CACHE_DIR, AVATAR_CACHE_MAX_BYTES, AVATAR_THUMBNAIL_SIZE))
 
 def build_prompt(user_input):
-    global content_topic
-    context = " ".join([x['content'] for x in chat_history[-3:]])
+    context = " ".join([x['content'] for x in get_chat_history(3)])
     prompt = f"请严格按照JSON格式（只要JSON格式部分的内容），生成一个高水准且结构化关于{user_input}的具体小红书人设。人设内容只包括姓名（有趣且惊艳）、性别、年龄、位置、个人情况（使用多个高级短句和emoji表情符号阐述职业、成就、轻松有趣的话语，短句格式参考“时装设计师\n宋朝业余搞笑女\n心理咨询师，情感问题解决\n爱助人｜爱折腾｜爱阅读得00后大学生\n学习资源，成长干货分享\n自律女孩｜成长学习｜书籍分享\n成为更优秀的自己！向更优秀的人学习！”）、兴趣（多字词语）。用中文回答！"
     return prompt
 
@@ -29,15 +24,36 @@ def clean_api_response(response):
         return response
 
 def generate_image_url(persona_description):
-    response = client.images.generations(
+    return get_gateway().generate_image(
         model="cogview-3",
         prompt=persona_description
     )
-    return response.data[0].url
+
+def generate_avatar(persona_description):
+    """生成头像并下载到本地缓存，返回图片摘要；相同人设描述直接复用已缓存的图片。"""
+    return get_avatar_cache().get_or_generate(
+        "cogview-3",
+        persona_description,
+        lambda: generate_image_url(persona_description)
+    )
+
+def avatar_data_uri(digest):
+    """缩略图的 data URI。每个会话只在首次显示时读取缩略图并刷新使用时间，之后的重跑直接复用。"""
+    if not digest:
+        return ""
+    shown = st.session_state.setdefault("avatar_data_uris", {})
+    if digest not in shown:
+        avatar_cache = get_avatar_cache()
+        thumbnail = avatar_cache.read_thumbnail(digest)
+        if thumbnail is None:
+            return ""
+        avatar_cache.touch(digest)
+        shown[digest] = "data:image/jpeg;base64," + base64.b64encode(thumbnail).decode('ascii')
+    return shown[digest]
 
 def generate_content(persona, topic):
     prompt = f"基于以下人设生成关于'{topic}'的笔记：{persona}"
-    response = client.chat.completions.create(
+    response = get_gateway().create(
         # model="glm-3-turbo",
         model="glm-4-0520",
         messages=[
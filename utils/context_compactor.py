@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+# 摘要在后台生成，不占用用户等待回复的时间
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="context-compactor")
+
+
+class ContextCompactor:
+    """把长对话压缩为：系统提示 + 滚动摘要 + 最近 keep_turns 轮原文。
+
+    transcript 是完整对话（第一条为系统提示），只增不改。窗口之外、尚未并入摘要的消息
+    累计达到 fold_messages 条时，在后台调用 summarize_fn(旧摘要, 新消息) 生成新摘要；
+    摘要落后期间这些消息按原文发送，不会丢失上下文。
+    """
+
+    def __init__(self, summarize_fn: Callable[[str, List[dict]], str], keep_turns: int = 4, fold_messages: int = 4):
+        self.summarize_fn = summarize_fn
+        self.keep_messages = keep_turns * 2
+        self.fold_messages = fold_messages
+        self.summary = ""
+        self.summarized_upto = 1  # transcript[1:summarized_upto] 已并入摘要
+        self._future = None
+        self._lock = threading.Lock()
+
+    def state(self) -> dict:
+        with self._lock:
+            return {"summary": self.summary, "summarized_upto": self.summarized_upto}
+
+    def restore(self, state: dict):
+        with self._lock:
+            self.summary = state.get("summary", "")
+            self.summarized_upto = state.get("summarized_upto", 1)
+
+    def _window_start(self, transcript: List[dict]) -> int:
+        return max(1, len(transcript) - self.keep_messages)
+
+    def build_messages(self, transcript: List[dict]) -> List[dict]:
+        """返回实际发送给模型的上下文。"""
+        if not transcript:
+            return []
+        with self._lock:
+            summary, summarized_upto = self.summary, self.summarized_upto
+        system = dict(transcript[0])
+        if summary:
+            system['content'] = f"{system['content']}\n\n此前对话的摘要：\n{summary}"
+        return [system] + transcript[summarized_upto:]
+
+    def refresh(self, transcript: List[dict]):
+        """窗口外未摘要的消息足够多且没有进行中的摘要任务时，提交一次后台摘要。"""
+        end = self._window_start(transcript)
+        with self._lock:
+            if self._future is not None or end - self.summarized_upto < self.fold_messages:
+                return
+            summary, start = self.summary, self.summarized_upto
+            self._future = _executor.submit(self._summarize, summary, list(transcript[start:end]), end)
+
+    def _summarize(self, summary: str, messages: List[dict], end: int):
+        try:
+            new_summary = self.summarize_fn(summary, messages)
+        except Exception:
+            # 摘要失败时保持原样，下次 refresh 再试
+            new_summary = None
+        with self._lock:
+            if new_summary:
+                self.summary = new_summary
+                self.summarized_upto = end
+            self._future = None
@@ -1,30 +1,59 @@
-from config.config import MAX_HISTORY_LENGTH
+from typing import Optional
+from config.config import MAX_HISTORY_LENGTH, HISTORY_TOKEN_BUDGET, SESSION_IDLE_TTL
+from utils.conversation_store import Conversation, ConversationStore
 
-chat_history = []  # 用于存储聊天记录
-content_topic = ""  # 用于存储用户输入的内容主题
-shared_context = {}
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # 旧版 Streamlit
+    from streamlit.scriptrunner import get_script_run_ctx
 
-def add_to_chat_history(role, content):
-    global chat_history
-    if len(chat_history) >= MAX_HISTORY_LENGTH:
-        chat_history.pop(0)  # 移除最早的记录
-    chat_history.append({'role': role, 'content': content})
+# 聊天记录和共享上下文按 Streamlit 会话隔离，不同用户互不影响
+conversation_store = ConversationStore(HISTORY_TOKEN_BUDGET, MAX_HISTORY_LENGTH, SESSION_IDLE_TTL)
 
-def update_context(agent, data):
-    global shared_context
-    shared_context[agent] = data
+def current_session_id() -> Optional[str]:
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
 
-def get_context(agent):
-    return shared_context.get(agent, {})
+def get_conversation(session_id: Optional[str] = None) -> Optional[Conversation]:
+    """返回会话的聊天记录；在没有会话上下文的后台线程中调用且未指定 session_id 时返回 None。"""
+    session_id = session_id or current_session_id()
+    if session_id is None:
+        return None
+    return conversation_store.get(session_id)
+
+def add_to_chat_history(role, content, session_id=None):
+    conversation = get_conversation(session_id)
+    # 多个会话共享的后台任务（如题池补充）不属于任何会话，不记录
+    if conversation is not None:
+        conversation.append(role, content)
+
+def get_chat_history(last=None, session_id=None):
+    conversation = get_conversation(session_id)
+    return conversation.messages(last) if conversation is not None else []
+
+def get_content_topic(session_id=None):
+    return get_context('content_topic', session_id) or ""
+
+def set_content_topic(topic, session_id=None):
+    update_context('content_topic', topic, session_id)
+
+def update_context(agent, data, session_id=None):
+    conversation = get_conversation(session_id)
+    if conversation is not None:
+        conversation.context[agent] = data
+
+def get_context(agent, session_id=None):
+    conversation = get_conversation(session_id)
+    return conversation.context.get(agent, {}) if conversation is not None else {}
 
 def build_prompt(user_input, agent):
-    global content_topic
-    context = " ".join([x['content'] for x in chat_history[-3:]])
+    content_topic = get_content_topic()
+    context = " ".join([x['content'] for x in get_chat_history(3)])
     if agent == 'advantage_agent':
         prompt = f"根据用户近期关心的内容主题'{content_topic}'，请严格按照JSON格式（只要JSON格式部分的内容）描述{user_input} 主题下用户可能的优势。"
     elif agent == 'positioning_agent':
         prompt = f"针对'{content_topic}'， 严格按照JSON格式（只要JSON格式部分的内容），生成一个高水准且结构化关于{user_input}的具体小红书人设。人设内容只包括姓名（有趣且惊艳）、性别、年龄、位置、个人情况（使用多个高级短句和emoji表情符号阐述职业、成就、轻松有趣的话语，短句格式参考“时装设计师\n宋朝业余搞笑女\n心理咨询师，情感问题解决\n爱助人｜爱折腾｜爱阅读得00后大学生\n学习资源，成长干货分享\n自律女孩｜成长学习｜书籍分享\n成为更优秀的自己！向更优秀的人学习！”）、兴趣（多字词语）。用中文回答！"
     elif agent == 'chat_agent':
-        prompt = " ".join([m['content'] for m in chat_history])
+        prompt = " ".join([m['content'] for m in get_chat_history()])
 
     return prompt
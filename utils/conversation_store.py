@@ -0,0 +1,88 @@
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+_CJK = re.compile(r'[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日文字符按 1 个计，其余按 4 个字符 1 个计。"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class Conversation:
+    """单个会话的聊天记录，按 token 预算裁剪。
+
+    总 token 数超过 token_budget 时从最早一条开始淘汰，最新一条始终保留。
+    max_messages 只是条数的安全上限（定长 deque，超出时 O(1) 丢弃最早一条），应远大于预算内的常见条数。
+    """
+
+    def __init__(self, token_budget: int, max_messages: int):
+        self.token_budget = token_budget
+        self._messages = deque(maxlen=max_messages)
+        self._tokens = 0
+        self.context = {}
+        self.last_used = time.time()
+        self._lock = threading.Lock()
+
+    def append(self, role: str, content: str):
+        tokens = estimate_tokens(content)
+        with self._lock:
+            if len(self._messages) == self._messages.maxlen:
+                self._tokens -= self._messages[0][2]
+            self._messages.append((role, content, tokens))
+            self._tokens += tokens
+            while self._tokens > self.token_budget and len(self._messages) > 1:
+                self._tokens -= self._messages.popleft()[2]
+            self.last_used = time.time()
+
+    def messages(self, last: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            items = list(self._messages)
+        if last is not None:
+            items = items[-last:] if last else []
+        return [{'role': role, 'content': content} for role, content, _ in items]
+
+    @property
+    def tokens(self) -> int:
+        with self._lock:
+            return self._tokens
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._messages)
+
+
+class ConversationStore:
+    """按会话 ID 隔离的聊天记录，超过 idle_ttl 秒未使用的会话会被清理。"""
+
+    def __init__(self, token_budget: int, max_messages: int, idle_ttl: float = 3600):
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self._conversations: Dict[str, Conversation] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Conversation:
+        now = time.time()
+        with self._lock:
+            conversation = self._conversations.get(session_id)
+            if conversation is None:
+                self._expire(now)
+                conversation = Conversation(self.token_budget, self.max_messages)
+                self._conversations[session_id] = conversation
+            conversation.last_used = now
+            return conversation
+
+    def _expire(self, now: float):
+        expired = [key for key, conversation in self._conversations.items()
+                   if now - conversation.last_used > self.idle_ttl]
+        for key in expired:
+            del self._conversations[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._conversations)
@@ -0,0 +1,140 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+import requests
+from typing import Callable, Optional
+
+
+class ImageCache:
+    """按内容寻址的本地图片缓存。
+
+    原图保存为 <sha256>.img，同目录下保存缩略图 <sha256>.thumb.jpg；
+    SQLite 记录 (模型, 提示词) 到图片摘要的映射，相同提示词不再重复生成。
+    所有文件总大小超过 max_bytes 时按最近使用时间淘汰。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 200 * 1024 * 1024, thumbnail_size: int = 256,
+                 download_timeout: float = 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        self.download_timeout = download_timeout
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            "digest TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prompts ("
+            "key TEXT PRIMARY KEY, digest TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_images_last_used ON images(last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_prompts_digest ON prompts(digest)")
+        self._conn.commit()
+
+    @staticmethod
+    def _prompt_key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def image_path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.img")
+
+    def thumbnail_path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.thumb.jpg")
+
+    def _make_thumbnail(self, data: bytes) -> bytes:
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert("RGB")
+            image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=85)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _write_file(path: str, data: bytes):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put_bytes(self, data: bytes) -> str:
+        """保存图片及其缩略图，返回内容摘要；同样的内容只存一份。"""
+        digest = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self.thumbnail_path(digest)):
+            thumbnail = self._make_thumbnail(data)
+            self._write_file(self.image_path(digest), data)
+            self._write_file(self.thumbnail_path(digest), thumbnail)
+        size = os.path.getsize(self.image_path(digest)) + os.path.getsize(self.thumbnail_path(digest))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images (digest, size, last_used) VALUES (?, ?, ?)",
+                (digest, size, time.time())
+            )
+            self._conn.commit()
+            self._evict()
+        return digest
+
+    def _download(self, url: str) -> bytes:
+        response = requests.get(url, timeout=self.download_timeout)
+        response.raise_for_status()
+        return response.content
+
+    def lookup(self, model: str, prompt: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM prompts WHERE key = ?", (self._prompt_key(model, prompt),)
+            ).fetchone()
+        if row and os.path.exists(self.thumbnail_path(row[0])):
+            self.touch(row[0])
+            return row[0]
+        return None
+
+    def get_or_generate(self, model: str, prompt: str, generate_url: Callable[[], str]) -> str:
+        """返回提示词对应图片的摘要；未缓存时调用 generate_url 生成并立即下载（远程链接会过期）。"""
+        digest = self.lookup(model, prompt)
+        if digest is not None:
+            return digest
+        digest = self.put_bytes(self._download(generate_url()))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO prompts (key, digest) VALUES (?, ?)", (self._prompt_key(model, prompt), digest)
+            )
+            self._conn.commit()
+        return digest
+
+    def touch(self, digest: str):
+        with self._lock:
+            self._conn.execute("UPDATE images SET last_used = ? WHERE digest = ?", (time.time(), digest))
+            self._conn.commit()
+
+    def read_thumbnail(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(self.thumbnail_path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM images").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for digest, size in self._conn.execute("SELECT digest, size FROM images ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            for path in (self.image_path(digest), self.thumbnail_path(digest)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._conn.execute("DELETE FROM prompts WHERE digest = ?", (digest,))
+            self._conn.execute("DELETE FROM images WHERE digest = ?", (digest,))
+            total -= size
+        self._conn.commit()
@@ -0,0 +1,181 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Iterator, List, Optional
+from zhipuai import (ZhipuAI, APIConnectionError, APITimeoutError, APIReachLimitError,
+                     APIInternalError, APIServerFlowExceedError)
+from config.config import (openai_api_key, LLM_BASE_URL, LLM_TIMEOUT, LLM_MAX_RETRIES,
+                           LLM_RATE_LIMIT, LLM_BURST, LLM_MAX_CONCURRENCY, LLM_CACHE_FILE, LLM_CACHE_TTL,
+                           LLM_CACHE_MAX_ENTRIES, LLM_CACHE_SIMILARITY, LLM_CACHE_POLICIES)
+from utils.response_cache import ResponseCache
+from utils.resources import get_resource
+
+# 网络错误、超时、429 和 5xx 可以重试，其余错误（鉴权、参数）直接抛出
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, APIReachLimitError,
+                    APIInternalError, APIServerFlowExceedError)
+
+
+class TokenBucket:
+    """令牌桶限流：平均每秒 rate 个请求，最多允许 capacity 个突发请求。"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class LLMGateway:
+    """所有大模型调用的统一入口。
+
+    共享一个 ZhipuAI 客户端（复用连接池），每次调用带超时，
+    可重试的错误按带抖动的指数退避重试，并通过令牌桶和并发上限保护 API Key 的配额。
+    complete/stream 传入 cache（方法名）时，按 cache_policies 中该方法的策略查询回复缓存；
+    cache_variant 用于区分同一提示词下希望得到不同结果的多次请求（如第几个人设）。
+    """
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, timeout: float = 60,
+                 max_retries: int = 3, rate: float = 2.0, burst: int = 5, max_concurrency: int = 8,
+                 backoff: float = 1.0, max_backoff: float = 20.0, response_cache: Optional[ResponseCache] = None,
+                 cache_policies: Optional[dict] = None):
+        # 重试由网关统一处理，关闭 SDK 自带的重试
+        self.client = ZhipuAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter = TokenBucket(rate, burst)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.response_cache = response_cache
+        self.cache_policies = cache_policies or {}
+
+    def _cache_policy(self, cache: Optional[str]) -> Optional[str]:
+        if cache is None or self.response_cache is None:
+            return None
+        return self.cache_policies.get(cache)
+
+    def _call(self, func, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                return func(*args, **kwargs)
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def create(self, model: str, messages: List[dict], timeout: Optional[float] = None, **params):
+        """与 client.chat.completions.create 参数一致，返回原始响应。"""
+        with self._slots:
+            return self._call(self.client.chat.completions.create, model=model, messages=messages,
+                              timeout=timeout or self.timeout, **params)
+
+    def complete(self, model: str, messages: List[dict], timeout: Optional[float] = None,
+                 cache: Optional[str] = None, cache_variant=None, cache_key: Optional[str] = None, **params) -> str:
+        policy = self._cache_policy(cache)
+        cache_params = {**params, "cache_variant": cache_variant}
+        if policy:
+            cached = self.response_cache.get(cache, model, messages, cache_params, semantic=policy == "semantic",
+                                             semantic_key=cache_key)
+            if cached is not None:
+                return cached
+
+        response = self.create(model, messages, timeout=timeout, **params)
+        result = response.choices[0].message.content
+        if policy:
+            self.response_cache.put(cache, model, messages, cache_params, result, semantic=policy == "semantic",
+                                    semantic_key=cache_key)
+        return result
+
+    def stream(self, model: str, messages: List[dict], timeout: Optional[float] = None,
+               cache: Optional[str] = None, cache_variant=None, cache_key: Optional[str] = None, **params) -> Iterator[str]:
+        """逐段产出增量文本；只有建立流之前的错误会被重试。命中缓存时一次性产出完整回复。
+
+        cache_key 为语义缓存使用的查询文本（如用户原始输入），默认取最后一条消息。
+        """
+        policy = self._cache_policy(cache)
+        cache_params = {**params, "cache_variant": cache_variant}
+        if policy:
+            cached = self.response_cache.get(cache, model, messages, cache_params, semantic=policy == "semantic",
+                                             semantic_key=cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        deltas = []
+        for delta in self._stream(model, messages, timeout, **params):
+            deltas.append(delta)
+            yield delta
+        # 只缓存完整接收的回复
+        if policy:
+            self.response_cache.put(cache, model, messages, cache_params, "".join(deltas),
+                                    semantic=policy == "semantic", semantic_key=cache_key)
+
+    def _stream(self, model: str, messages: List[dict], timeout: Optional[float], **params) -> Iterator[str]:
+        self._slots.acquire()
+        try:
+            response = self._call(self.client.chat.completions.create, model=model, messages=messages,
+                                  stream=True, timeout=timeout or self.timeout, **params)
+            for chunk in response:
+                if chunk.choices and getattr(chunk.choices[0], 'delta', None) and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            self._slots.release()
+
+    def generate_image(self, prompt: str, model: str = "cogview-3", timeout: Optional[float] = None) -> str:
+        with self._slots:
+            response = self._call(self.client.images.generations, model=model, prompt=prompt,
+                                  timeout=timeout or self.timeout)
+        return response.data[0].url
+
+    async def acomplete(self, model: str, messages: List[dict], timeout: Optional[float] = None,
+                        cache: Optional[str] = None, cache_variant=None, cache_key: Optional[str] = None, **params) -> str:
+        return await asyncio.to_thread(self.complete, model, messages, timeout, cache, cache_variant,
+                                       cache_key, **params)
+
+    async def agenerate_image(self, prompt: str, model: str = "cogview-3", timeout: Optional[float] = None) -> str:
+        return await asyncio.to_thread(self.generate_image, prompt, model, timeout)
+
+
+def _embed_prompt(text: str) -> List[float]:
+    # 语义缓存复用知识库的嵌入流程（含嵌入缓存），延迟导入，只有用到语义缓存时才加载
+    from knowledge_base.embeddings import get_embeddings_for_long_text
+    return get_embeddings_for_long_text(text)
+
+
+def _create_gateway() -> LLMGateway:
+    return LLMGateway(
+        openai_api_key,
+        base_url=LLM_BASE_URL,
+        timeout=LLM_TIMEOUT,
+        max_retries=LLM_MAX_RETRIES,
+        rate=LLM_RATE_LIMIT,
+        burst=LLM_BURST,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        response_cache=ResponseCache(
+            LLM_CACHE_FILE,
+            max_entries=LLM_CACHE_MAX_ENTRIES,
+            ttl=LLM_CACHE_TTL,
+            embed_fn=_embed_prompt,
+            similarity_threshold=LLM_CACHE_SIMILARITY
+        ),
+        cache_policies=LLM_CACHE_POLICIES
+    )
+
+
+def get_gateway() -> LLMGateway:
+    return get_resource("llm_gateway", _create_gateway)
@@ -0,0 +1,46 @@
+import threading
+import time
+from typing import Any, Callable, Dict
+
+# 进程级共享资源（客户端、缓存、索引等）：每个名字只创建一次，所有会话和页面共用
+_resources: Dict[str, Any] = {}
+_creation_seconds: Dict[str, float] = {}
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(name: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(name, threading.Lock())
+
+
+def get_resource(name: str, factory: Callable[[], Any]) -> Any:
+    """返回名为 name 的资源，首次调用时用 factory 创建；并发的首次调用只会创建一次。"""
+    try:
+        return _resources[name]
+    except KeyError:
+        pass
+    with _lock_for(name):
+        if name not in _resources:
+            start = time.perf_counter()
+            _resources[name] = factory()
+            _creation_seconds[name] = time.perf_counter() - start
+    return _resources[name]
+
+
+def set_resource(name: str, value: Any):
+    """直接注册资源（如指向其他服务地址的客户端），之后 get_resource 返回该值。"""
+    with _lock_for(name):
+        _resources[name] = value
+
+
+def reset_resource(name: str):
+    """丢弃资源，下次 get_resource 时重新创建。"""
+    with _lock_for(name):
+        _resources.pop(name, None)
+        _creation_seconds.pop(name, None)
+
+
+def resource_creation_times() -> Dict[str, float]:
+    """已创建资源的创建耗时（秒），用于启动报告。"""
+    return dict(_creation_seconds)
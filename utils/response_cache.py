@@ -0,0 +1,137 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+from collections import defaultdict
+from typing import Callable, List, Optional
+
+
+class ResponseCache:
+    """大模型回复缓存，分两级：
+
+    1. 精确匹配：(模型, 消息, 参数) 的哈希完全一致；
+    2. 语义匹配（可选）：上下文（除最后一条消息外的所有内容）一致，
+       且最后一条消息的嵌入与缓存项的余弦相似度不低于 similarity_threshold。
+       调用方传入 semantic_key 时改用它做嵌入，上下文只看 (模型, 参数)，
+       适用于把用户输入和检索结果拼成一整条提示词的场景。
+
+    缓存项超过 ttl 秒失效，总数超过 max_entries 时按最近使用时间淘汰。
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, ttl: float = 86400,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self._stats = defaultdict(lambda: {"exact_hits": 0, "semantic_hits": 0, "misses": 0})
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, namespace TEXT NOT NULL, context_key TEXT NOT NULL, "
+            "response TEXT NOT NULL, embedding BLOB, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_context ON responses(context_key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _hash(payload) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+    def _keys(self, namespace: str, model: str, messages: List[dict], params: dict, semantic_key: Optional[str] = None):
+        key = self._hash([namespace, model, messages, params])
+        context = None if semantic_key is not None else messages[:-1]
+        context_key = self._hash([namespace, model, context, params])
+        return key, context_key
+
+    @staticmethod
+    def _query_text(messages: List[dict], semantic_key: Optional[str] = None) -> str:
+        if semantic_key is not None:
+            return semantic_key
+        return messages[-1]["content"] if messages else ""
+
+    def _embed(self, messages: List[dict], semantic_key: Optional[str] = None) -> Optional[np.ndarray]:
+        if self.embed_fn is None:
+            return None
+        try:
+            vector = np.asarray(self.embed_fn(self._query_text(messages, semantic_key)), dtype='float32')
+        except Exception:
+            # 嵌入失败只会让语义缓存失效，不影响正常调用
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def get(self, namespace: str, model: str, messages: List[dict], params: dict, semantic: bool = False,
+            semantic_key: Optional[str] = None) -> Optional[str]:
+        key, context_key = self._keys(namespace, model, messages, params, semantic_key)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created >= ?", (key, now - self.ttl)
+            ).fetchone()
+            if row:
+                self._touch(key, now)
+                self._stats[namespace]["exact_hits"] += 1
+                return row[0]
+
+        if semantic:
+            query = self._embed(messages, semantic_key)
+            if query is not None:
+                with self._lock:
+                    rows = self._conn.execute(
+                        "SELECT key, response, embedding FROM responses "
+                        "WHERE context_key = ? AND embedding IS NOT NULL AND created >= ?",
+                        (context_key, now - self.ttl)
+                    ).fetchall()
+                    if rows:
+                        matrix = np.vstack([np.frombuffer(embedding, dtype='float32') for _, _, embedding in rows])
+                        similarities = matrix @ query
+                        best = int(np.argmax(similarities))
+                        if similarities[best] >= self.similarity_threshold:
+                            self._touch(rows[best][0], now)
+                            self._stats[namespace]["semantic_hits"] += 1
+                            return rows[best][1]
+
+        with self._lock:
+            self._stats[namespace]["misses"] += 1
+        return None
+
+    def _touch(self, key: str, now: float):
+        self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+
+    def put(self, namespace: str, model: str, messages: List[dict], params: dict, response: str, semantic: bool = False,
+            semantic_key: Optional[str] = None):
+        if not response:
+            return
+        key, context_key = self._keys(namespace, model, messages, params, semantic_key)
+        embedding = self._embed(messages, semantic_key) if semantic else None
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, namespace, context_key, response, embedding, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, namespace, context_key, response, embedding.tobytes() if embedding is not None else None, now, now)
+            )
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """按方法统计命中情况，hit_rate 包含精确和语义两级命中。"""
+        with self._lock:
+            result = {}
+            for namespace, counts in self._stats.items():
+                total = counts["exact_hits"] + counts["semantic_hits"] + counts["misses"]
+                hits = counts["exact_hits"] + counts["semantic_hits"]
+                result[namespace] = {**counts, "hit_rate": hits / total if total else 0.0}
+            return result
@@ -0,0 +1,39 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, Dict, NamedTuple, Tuple
+
+# 共享线程池：超时的检索任务在后台自然结束，不会阻塞页面
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+
+
+class RetrievalResult(NamedTuple):
+    value: Any
+    status: str  # "ok"、"timeout" 或 "error"
+    error: str
+    seconds: float
+
+
+def retrieve_concurrently(sources: Dict[str, Tuple[Callable[[], Any], float]], default=None) -> Dict[str, RetrievalResult]:
+    """并发执行各检索源，每个源有自己的截止时间（秒，从调用开始计）。
+
+    超时或出错的源返回 default，其余源的结果照常返回；总耗时约等于最慢且未超时的源。
+    """
+    start = time.monotonic()
+    finished_at = {}
+    futures = {}
+    for name, (fn, deadline) in sources.items():
+        future = _executor.submit(fn)
+        future.add_done_callback(lambda _, name=name: finished_at.setdefault(name, time.monotonic()))
+        futures[name] = (future, deadline)
+
+    results = {}
+    for name, (future, deadline) in futures.items():
+        try:
+            value = future.result(timeout=max(0.0, start + deadline - time.monotonic()))
+            results[name] = RetrievalResult(value, "ok", "", finished_at.get(name, time.monotonic()) - start)
+        except TimeoutError:
+            future.cancel()
+            results[name] = RetrievalResult(default, "timeout", "", deadline)
+        except Exception as e:
+            results[name] = RetrievalResult(default, "error", str(e), finished_at.get(name, time.monotonic()) - start)
+    return results
@@ -0,0 +1,58 @@
+import json
+import uuid
+import streamlit as st
+from config.config import SESSION_DB_FILE, SESSION_FLUSH_INTERVAL, SESSION_RETENTION
+from utils.session_store import SessionStore
+from utils.resources import get_resource
+
+# 会话标识放在页面 URL 的查询参数里，刷新页面或服务重启后仍能找回
+SESSION_QUERY_PARAM = "sid"
+
+def get_session_store():
+    return get_resource("session_store", lambda: SessionStore(
+        SESSION_DB_FILE, flush_interval=SESSION_FLUSH_INTERVAL, retention=SESSION_RETENTION
+    ))
+
+def _get_query_param(name):
+    if hasattr(st, "query_params"):
+        return st.query_params.get(name)
+    values = st.experimental_get_query_params().get(name)
+    return values[0] if values else None
+
+def _set_query_param(name, value):
+    if hasattr(st, "query_params"):
+        st.query_params[name] = value
+    else:
+        params = st.experimental_get_query_params()
+        params[name] = value
+        st.experimental_set_query_params(**params)
+
+def persistent_session_id():
+    if "persistent_session_id" not in st.session_state:
+        session_id = _get_query_param(SESSION_QUERY_PARAM)
+        if not session_id:
+            session_id = uuid.uuid4().hex
+            _set_query_param(SESSION_QUERY_PARAM, session_id)
+        st.session_state.persistent_session_id = session_id
+        st.session_state.persisted_values = {}
+        st.session_state.restored_values = get_session_store().load(session_id)
+    return st.session_state.persistent_session_id
+
+def restore_session_state(keys):
+    """把持久化的值恢复到 st.session_state 中尚不存在的键，每个会话只恢复一次。"""
+    persistent_session_id()
+    restored = st.session_state.restored_values
+    for key in keys:
+        if key in restored and key not in st.session_state:
+            st.session_state[key] = restored[key]
+            st.session_state.persisted_values[key] = json.dumps(restored[key], ensure_ascii=False)
+
+def persist_session_state(values):
+    """把有变化的值交给后台批量写入，不阻塞本次运行。values 为 {键: 可 JSON 序列化的值}。"""
+    session_id = persistent_session_id()
+    persisted = st.session_state.persisted_values
+    for key, value in values.items():
+        encoded = json.dumps(value, ensure_ascii=False)
+        if persisted.get(key) != encoded:
+            get_session_store().save_encoded(session_id, key, encoded)
+            persisted[key] = encoded
@@ -0,0 +1,117 @@
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict
+
+
+class SessionStore:
+    """SQLite（WAL 模式）会话状态存储，写入采用 write-behind。
+
+    save 只把 (会话, 键) 的最新值放进内存队列并立即返回，同一键在一个周期内的多次写入会合并；
+    后台线程每 flush_interval 秒在一个事务里批量写入。超过 retention 秒未更新的会话在压缩时删除。
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, retention: float = 30 * 24 * 3600,
+                 compact_interval: float = 3600):
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.compact_interval = compact_interval
+        self._pending: Dict[tuple, str] = {}
+        self._pending_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_state ("
+            "session_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (session_id, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_session_state_updated ON session_state(updated)")
+        self._conn.commit()
+        self.compact()
+        self._last_compact = time.time()
+        self._writer = threading.Thread(target=self._run, name="session-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def load(self, session_id: str) -> Dict[str, Any]:
+        """读出会话的全部状态；尚未落盘的写入优先。"""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM session_state WHERE session_id = ?", (session_id,)
+            ).fetchall()
+        values = dict(rows)
+        with self._pending_lock:
+            values.update({key: value for (sid, key), value in self._pending.items() if sid == session_id})
+        return {key: json.loads(value) for key, value in values.items()}
+
+    def save(self, session_id: str, key: str, value: Any):
+        self.save_encoded(session_id, key, json.dumps(value, ensure_ascii=False))
+
+    def save_encoded(self, session_id: str, key: str, encoded: str):
+        """写入已经序列化好的 JSON 字符串。"""
+        with self._pending_lock:
+            self._pending[(session_id, key)] = encoded
+
+    def delete_session(self, session_id: str):
+        self.flush()
+        with self._db_lock:
+            self._conn.execute("DELETE FROM session_state WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def flush(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        now = time.time()
+        try:
+            with self._db_lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO session_state (session_id, key, value, updated) VALUES (?, ?, ?, ?)",
+                    [(session_id, key, value, now) for (session_id, key), value in pending.items()]
+                )
+                self._conn.commit()
+        except sqlite3.Error:
+            # 放回队列，期间又有新值的键以新值为准
+            with self._pending_lock:
+                for item, value in pending.items():
+                    self._pending.setdefault(item, value)
+            raise
+
+    def compact(self):
+        """删除过期会话，并把 WAL 检查点回主库。"""
+        with self._db_lock:
+            self._conn.execute(
+                "DELETE FROM session_state WHERE session_id IN "
+                "(SELECT session_id FROM session_state GROUP BY session_id HAVING MAX(updated) < ?)",
+                (time.time() - self.retention,)
+            )
+            self._conn.commit()
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                if time.time() - self._last_compact > self.compact_interval:
+                    self.compact()
+                    self._last_compact = time.time()
+            except sqlite3.Error:
+                # 写入失败不影响页面，下个周期继续
+                pass
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join(timeout=5)
+        self.flush()
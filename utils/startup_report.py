@@ -0,0 +1,96 @@
+"""启动耗时报告。
+
+页面模块在首次选中时才导入，import_page 记录每个页面的首次导入耗时，供侧边栏展示。
+命令行下对每个页面模块单独起一个解释器，用 `python -X importtime` 测量冷启动导入耗时，
+按顶层包汇总，便于在不同提交之间对比：
+
+    python -m utils.startup_report            # 表格
+    python -m utils.startup_report --json     # 机器可读
+"""
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+_page_imports: Dict[str, Tuple[float, int]] = {}
+
+def import_page(module_name: str, function_name: str) -> Callable:
+    """导入页面模块并返回入口函数，首次导入时记录耗时和新加载的模块数。"""
+    if module_name not in sys.modules:
+        loaded_before = len(sys.modules)
+        start = time.perf_counter()
+        importlib.import_module(module_name)
+        _page_imports[module_name] = (time.perf_counter() - start, len(sys.modules) - loaded_before)
+    return getattr(sys.modules[module_name], function_name)
+
+def page_import_times() -> Dict[str, Tuple[float, int]]:
+    """{模块名: (首次导入秒数, 新加载模块数)}"""
+    return dict(_page_imports)
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """解析 -X importtime 的输出，返回 [(模块名, 自身微秒, 累计微秒)]。"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        rows.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return rows
+
+def _run_importtime(statement: str) -> subprocess.CompletedProcess:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                          cwd=root, capture_output=True, text=True)
+
+def interpreter_modules() -> set:
+    """空解释器启动时就会导入的模块，测量时扣除。"""
+    return {name for name, _, _ in parse_importtime(_run_importtime("pass").stderr)}
+
+def measure_cold_import(module_name: str, baseline: set = frozenset()) -> dict:
+    result = _run_importtime(f"import {module_name}")
+    rows = [row for row in parse_importtime(result.stderr) if row[0] not in baseline]
+    by_package = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    return {
+        "module": module_name,
+        "ok": result.returncode == 0,
+        "error": result.stderr.strip().splitlines()[-1] if result.returncode else "",
+        "total_ms": sum(self_us for _, self_us, _ in rows) / 1000,
+        "modules": len(rows),
+        "packages_ms": {name: us / 1000 for name, us in sorted(by_package.items(), key=lambda item: -item[1])}
+    }
+
+def default_modules() -> List[str]:
+    from methods import TEACHING_METHODS, KNOWLEDGE_BASE_PAGE
+    return ["main"] + [module for module, _ in TEACHING_METHODS.values()] + [KNOWLEDGE_BASE_PAGE[0]]
+
+def main():
+    parser = argparse.ArgumentParser(description="各页面模块的冷启动导入耗时")
+    parser.add_argument("modules", nargs="*", help="要测量的模块，默认是 main 和所有页面模块")
+    parser.add_argument("--top", type=int, default=5, help="每个模块列出耗时最多的几个顶层包")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    args = parser.parse_args()
+
+    baseline = interpreter_modules()
+    reports = [measure_cold_import(module, baseline) for module in args.modules or default_modules()]
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+        return
+    print(f"{'module':<45} {'total ms':>9} {'modules':>8}  heaviest packages")
+    for report in reports:
+        if not report["ok"]:
+            print(f"{report['module']:<45} {'-':>9} {'-':>8}  导入失败: {report['error']}")
+            continue
+        heaviest = ", ".join(f"{name} {ms:.0f}" for name, ms in list(report["packages_ms"].items())[:args.top])
+        print(f"{report['module']:<45} {report['total_ms']:>9.1f} {report['modules']:>8}  {heaviest}")
+
+if __name__ == "__main__":
+    main()
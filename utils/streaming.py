@@ -0,0 +1,31 @@
+import time
+from typing import Callable, Iterable, Optional
+
+STREAM_REFRESH_INTERVAL = 0.05  # 两次刷新页面之间的最小间隔（秒）
+STREAM_CURSOR = "▌"
+
+
+def render_stream(deltas: Iterable[str], placeholder=None, on_update: Optional[Callable[[str], None]] = None,
+                  min_interval: float = STREAM_REFRESH_INTERVAL) -> str:
+    """边接收边把累积文本写入 placeholder（st.empty()），返回完整文本。
+
+    on_update 在每次刷新时以当前累积文本调用，用于评分、图谱等增量后处理。
+    未传 placeholder 时只拼接文本。
+    """
+    text = ""
+    last_refresh = 0.0
+    for delta in deltas:
+        text += delta
+        if placeholder is None:
+            continue
+        now = time.monotonic()
+        if now - last_refresh >= min_interval:
+            placeholder.markdown(text + STREAM_CURSOR)
+            if on_update:
+                on_update(text)
+            last_refresh = now
+    if placeholder is not None:
+        placeholder.markdown(text)
+        if on_update:
+            on_update(text)
+    return text
@@ -0,0 +1,46 @@
+import os
+import itertools
+import streamlit.components.v1 as components
+
+LIB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib")
+# 与 plot_knowledge_graph 的配色一致，按 level 取值，超出的层级使用最后一项
+LEVEL_STYLES = [
+    {"color": "rgba(217,95,2,0.9)", "size": 20},  # 中心节点
+    {"color": "rgba(27,158,119,0.8)", "size": 15},
+    {"color": "rgba(117,112,179,0.8)", "size": 10},
+    {"color": "rgba(231,41,138,0.8)", "size": 8},
+    {"color": "rgba(102,166,30,0.8)", "size": 6},
+]
+
+_component = None
+# 同一次脚本运行中多次渲染时参数必须不同，否则 Streamlit 会报重复组件；
+# 因此每次重绘都会重新挂载 iframe，用户展开/收起的状态不会跨重绘保留
+_revisions = itertools.count()
+
+
+def _get_component():
+    global _component
+    if _component is None:
+        _component = components.declare_component("knowledge_graph", path=LIB_DIR)
+    return _component
+
+
+def graph_payload(graph) -> dict:
+    """把 networkx 图压缩为按下标引用的数组，节点顺序即加入图的顺序。"""
+    index = {node: i for i, node in enumerate(graph.nodes())}
+    return {
+        "labels": [data.get('label', str(node)) for node, data in graph.nodes(data=True)],
+        "levels": [data['level'] for _, data in graph.nodes(data=True)],
+        "edges": [i for u, v in graph.edges() for i in (index[u], index[v])],
+        "style": LEVEL_STYLES,
+    }
+
+
+def render_vis_network(graph, expand_level: int = 2, height: int = 760):
+    """在浏览器端用 vis-network 绘制图谱。
+
+    level 小于 expand_level 的节点默认展开，更深的子树先折叠为 “(+N)”，双击再展开；
+    每次调用都会按该规则重新初始化展开状态。
+    """
+    return _get_component()(graph=graph_payload(graph), expand_level=expand_level, height=height,
+                            revision=next(_revisions), default=None)